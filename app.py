@@ -1,79 +1,106 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
-from google_sheets import add_vendor, connect_to_sheet, get_reviews, add_review
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session
+from google_sheets import add_vendor, cache, find_vendor, get_columns, get_leads, get_rating, get_records, get_reviews, add_review, prefetch, public_vendor, queue_row, search_vendors, suggest_vendors, update_row
 from datetime import datetime
-import os
 import re
-import gspread
-import requests
-from collections import Counter, defaultdict
-from oauth2client.service_account import ServiceAccountCredentials
-from werkzeug.utils import secure_filename
-import smtplib
-from email.mime.text import MIMEText
 import config  # <--- NEW
+import assets
+import metrics
+from conditional import versioned
+from fragments import fragments
+from otp import send_email_otp, two_factor
+from uploads import image_url, save_upload, variants
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = config.UPLOAD_FOLDER
 app.secret_key = config.SECRET_KEY
+metrics.init_app(app, server_timing=config.SERVER_TIMING)
+assets.init_app(app)
+
+
+def listing_version():
+    return cache.version(config.VENDOR_SHEET, config.REVIEW_SHEET)
+
+
+def detail_version():
+    # The page hides phone numbers 90 days after sign-up, so it changes with the date too, and
+    # its photo URLs move to the resized variants once they are written
+    return f"{listing_version()}-{variants.version()}-{datetime.now():%Y-%m-%d}"
+
+
+def phone_visible(vendor):
+    # Call buttons show for subscribed vendors and for 90 days after sign-up
+    created = todatetime(vendor.get("created_at"))
+    return vendor.get("subscription") == "subscribed" or (datetime.now() - created).days <= 90
+
+
+def first_photo_url(vendor, size):
+    photos = vendor.get("photos")
+    return image_url(str(photos).split(",")[0], size) if photos else None
+
+
+def vendor_card(listing):
+    """Listing card HTML, re-rendered only when something it shows changed."""
+    show_phone = phone_visible(listing)
+    # The photo URL moves to the resized variant once that exists
+    version = (tuple(listing.items()), show_phone, first_photo_url(listing, "card"))
+    return fragments.render("card", listing.get("phone"), version,
+                            lambda: render_template("vendor_card.html", vendor=listing, show_phone=show_phone))
+
+
+def api_cached(version):
+    return versioned(version, config.API_CACHE_MAX_AGE, config.API_STALE_WHILE_REVALIDATE)
 
-TWOFACTOR_API_KEY = config.TWOFACTOR_API_KEY
-SENDER_EMAIL = config.SENDER_EMAIL
-SENDER_PASSWORD = config.SENDER_PASSWORD
 
 
 # ✅ Add to the top with other imports
 from flask import request
 
+def near_args():
+    """(lat, lon) and radius_km from the query string, or (None, None) without usable coordinates."""
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    radius_km = request.args.get("radius_km", type=float)
+    if radius_km is not None:
+        radius_km = min(max(radius_km, 0.0), config.GEO_MAX_RADIUS_KM)
+    return (lat, lon), radius_km
+
+
 # ✅ Replace the existing home route with this
 @app.route("/")
 def home():
     query = request.args.get("query", "").strip().lower()
     location = request.args.get("location", "").strip().lower()
 
-    ads, vendors = [], []
+    near, radius_km = near_args()
+    ads, vendors, next_cursor = [], [], None
 
     try:
-        ads = get_ads()
+        # Any of the three tabs that isn't cached comes back in one batched read
+        with metrics.phase("prefetch"):
+            prefetch(config.ADS_SHEET, config.VENDOR_SHEET, config.REVIEW_SHEET)
     except Exception as e:
-        print("Ad fetch failed:", e)
+        print("Prefetch failed:", e)
 
     try:
-        sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-        vendors = sheet.get_all_records()
-
-        # Add review data
-        review_sheet = connect_to_sheet("HelpoVendorSheet", "VendorReviews")
-        reviews = review_sheet.get_all_records()
-        review_map = defaultdict(list)
-        for r in reviews:
-            phone = str(r.get("VendorPhone", "")).strip()
-            try:
-                rating = int(r.get("Rating", 0))
-                if 1 <= rating <= 5 and phone:
-                    review_map[phone].append(rating)
-            except (ValueError, TypeError):
-                continue
-
-        for v in vendors:
-            phone = str(v.get("phone", "")).strip()
-            ratings = review_map.get(phone, [])
-            if ratings:
-                v["average_rating"] = round(sum(ratings) / len(ratings), 1)
-                v["review_count"] = len(ratings)
-            else:
-                v["average_rating"] = None
-                v["review_count"] = 0
-
-        # Filter by search and location
-        if query:
-            vendors = [v for v in vendors if query in v.get("business_name", "").lower() or query in v.get("category", "").lower()]
-        if location:
-            vendors = [v for v in vendors if location in v.get("city", "").lower()]
+        with metrics.phase("ads"):
+            ads = get_ads()
+    except Exception as e:
+        print("Ad fetch failed:", e)
 
+    try:
+        # Filter by search and location (or distance from the user), one page at a time
+        with metrics.phase("vendors"):
+            vendors, next_cursor, _ = search_vendors(query=query, city=location, limit=config.LISTING_PAGE_SIZE,
+                                                     cursor=request.args.get("cursor"), near=near,
+                                                     radius_km=radius_km)
     except Exception as e:
         print("Vendor fetch failed:", e)
 
-    return render_template("index.html", ads=ads, vendors=vendors)
+    return render_template("index.html", ads=ads, vendors=vendors, next_cursor=next_cursor,
+                           query=query, location=location, lat=near and near[0], lon=near and near[1],
+                           radius_km=radius_km)
 
 
 @app.route("/send_otp")
@@ -82,8 +109,7 @@ def send_otp():
     if not phone or not re.match(r"^91[6-9]\d{9}$", phone):
         return jsonify({"status": "Failed", "message": "Invalid phone format"})
     try:
-        response = requests.get(f"https://2factor.in/API/V1/{TWOFACTOR_API_KEY}/SMS/{phone}/AUTOGEN")
-        result = response.json()
+        result = two_factor.send(phone)
         print("📞 OTP API response:", result)  # ✅ Add this line
         if result.get("Status") == "Success":
             return jsonify({"status": "Success", "session_id": result.get("Details")})
@@ -99,8 +125,7 @@ def verify_otp():
     session_id = request.args.get("session_id")
     otp = request.args.get("otp")
     try:
-        response = requests.get(f"https://2factor.in/API/V1/{TWOFACTOR_API_KEY}/SMS/VERIFY/{session_id}/{otp}")
-        result = response.json()
+        result = two_factor.verify(session_id, otp)
         return jsonify({"status": result.get("Status", "Failed")})
     except Exception as e:
         return jsonify({"status": "Failed", "message": str(e)})
@@ -124,21 +149,18 @@ def vendor():
             return render_template("vendor.html", message=message)
 
         photos = request.files.getlist("photos")
-        photo_names = [photo.filename for photo in photos if photo.filename]
-        for photo in photos:
-            if photo.filename:
-                photo.save(os.path.join(app.config['UPLOAD_FOLDER'], photo.filename))
+        photo_names = [save_upload(photo) for photo in photos if photo.filename]
 
-        data["photos"] = ",".join(photo_names)
+        data["photos"] = ",".join(dict.fromkeys(photo_names))
         result = add_vendor(data)
         message = "Vendor already registered." if result == "duplicate" else "Vendor registered successfully!"
 
     return render_template("vendor.html", message=message)
 
 @app.route("/vendor/<phone>", methods=["GET", "POST"])
+@api_cached(detail_version)
 def vendor_detail(phone):
-    sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    vendor = next((v for v in sheet.get_all_records() if str(v["phone"]).strip() == phone.strip()), None)
+    _, vendor = find_vendor(phone=phone)
     if not vendor:
         return "Vendor not found", 404
 
@@ -147,59 +169,46 @@ def vendor_detail(phone):
         rating = request.form.get("rating")
         comment = request.form.get("comment")
         photo = request.files.get("review_photo")
-        filename = secure_filename(photo.filename) if photo and photo.filename else ""
-        if filename:
-            photo.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        filename = save_upload(photo) if photo and photo.filename else ""
         if name and rating and comment:
             add_review(phone, name, rating, filename, comment)
 
-    reviews = get_reviews(phone)
-    average_rating = round(sum(int(r["Rating"]) for r in reviews) / len(reviews), 1) if reviews else None
-    rating_counts = Counter(int(r["Rating"]) for r in reviews)
-    total_ratings = sum(rating_counts.values())
-
-    return render_template("vendor_detail.html", vendor=vendor, reviews=reviews, average_rating=average_rating,
-                           rating_counts=rating_counts, total_ratings=total_ratings)
+    with metrics.phase("reviews"):
+        reviews = get_reviews(phone)
+        rating = get_rating(phone)
+
+    vendor = public_vendor(vendor)
+    show_phone = phone_visible(vendor)
+    # The vendor block and the review list are each re-rendered only when what they show changed
+    info = fragments.render(
+        "info", phone, (tuple(vendor.items()), show_phone, first_photo_url(vendor, "large")),
+        lambda: render_template("vendor_info.html", vendor=vendor, show_phone=show_phone))
+    review_version = (tuple(review.values for review in reviews), rating.count, rating.average,
+                      tuple(image_url(review.get("Photo"), "thumb") for review in reviews if review.get("Photo")))
+    review_list = fragments.render(
+        "reviews", phone, review_version,
+        lambda: render_template("vendor_reviews.html", reviews=reviews, average_rating=rating.average,
+                                rating_counts=rating.rating_counts(), total_ratings=rating.count))
+
+    return render_template("vendor_detail.html", vendor=vendor, show_phone=show_phone, vendor_info=info,
+                           vendor_reviews=review_list)
 
 @app.route("/api/vendors")
+@api_cached(listing_version)
 def api_vendors():
     category = request.args.get("category", "").lower()
     query = request.args.get("query", "").lower()
+    city = request.args.get("city", "").lower()
+    sort = request.args.get("sort", "")
+    limit = min(max(request.args.get("limit", config.LISTING_PAGE_SIZE, type=int), 1), config.LISTING_MAX_PAGE_SIZE)
+    min_rating = request.args.get("min_rating", type=float)
+    near, radius_km = near_args()
 
-    vendor_sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    review_sheet = connect_to_sheet("HelpoVendorSheet", "VendorReviews")
-    vendors = vendor_sheet.get_all_records()
-    reviews = review_sheet.get_all_records()
-    review_map = defaultdict(list)
-    
-    for r in reviews:
-        # ✅ CORRECTED: Use 'VendorPhone' to match the detail page logic and the sheet header
-        phone = str(r.get("VendorPhone", "")).strip()
-        if not phone:
-            continue
-        try:
-            rating = int(r.get("Rating", 0))
-            if 1 <= rating <= 5:
-                review_map[phone].append(rating)
-        except (ValueError, TypeError):
-            continue
-
-    # ... (The rest of the function remains the same) ...
-    
-    # This part correctly uses the 'phone' key from the main vendor record
-    for v in vendors:
-        phone_key = str(v.get("phone", "")).strip()
-        ratings = review_map.get(phone_key, [])
-        v["average_rating"] = round(sum(ratings) / len(ratings), 1) if ratings else None
-        v["review_count"] = len(ratings)
-
-    # Filtering logic remains the same
-    if query:
-        vendors = [v for v in vendors if query in v.get('business_name', '').lower() or query in v.get('category', '').lower()]
-    if category:
-        vendors = [v for v in vendors if v.get('category', '').lower() == category]
+    vendors, next_cursor, total = search_vendors(query=query, category=category, city=city, sort=sort,
+                                                 min_rating=min_rating, limit=limit,
+                                                 cursor=request.args.get("cursor"), near=near, radius_km=radius_km)
 
-    return jsonify(vendors)
+    return jsonify({"vendors": vendors, "next_cursor": next_cursor, "total": total})
 
 @app.route("/admin/login", methods=["GET", "POST"])
 def admin_login():
@@ -217,8 +226,23 @@ def admin_login():
 def admin_dashboard():
     if not session.get("admin_logged_in"):
         return redirect(url_for("admin_login"))
-    sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    return render_template("admin_dashboard.html", vendors=sheet.get_all_records())
+    return render_template("admin_dashboard.html", vendors=get_records(config.VENDOR_SHEET))
+
+
+@app.route("/admin/cache-stats")
+def admin_cache_stats():
+    if not session.get("admin_logged_in"):
+        return redirect(url_for("admin_login"))
+    return jsonify(cache.stats())
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    token = request.headers.get("Authorization", "")
+    scraper = config.METRICS_TOKEN and token == f"Bearer {config.METRICS_TOKEN}"
+    if not (scraper or session.get("admin_logged_in")):
+        return redirect(url_for("admin_login"))
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 #@app.route("/vendor/dashboard")
 #def vendor_dashboard():
@@ -240,13 +264,8 @@ def vendor_dashboard():
         return redirect("/vendor/login")
 
     phone = session["vendor_phone"]
-    vendor_sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    contact_sheet = connect_to_sheet("HelpoVendorSheet", "ContactLeads")
-    vendors = vendor_sheet.get_all_records()
-    leads = contact_sheet.get_all_records()
-
-    vendor = next((v for v in vendors if str(v["phone"]).strip() == phone), None)
-    vendor_leads = [l for l in leads if str(l.get("vendor_phone", "")).strip() == phone]
+    prefetch(config.VENDOR_SHEET, config.LEADS_SHEET)
+    _, vendor = find_vendor(phone=phone)
 
     plans = [
         {
@@ -275,7 +294,7 @@ def vendor_dashboard():
 
     return render_template("vendor_dashboard.html",
                            vendor=vendor,
-                           lead_count=len(vendor_leads),
+                           lead_count=get_leads().count(phone),
                            active_tab="dashboard",
                            plans=plans,
                            message=message)
@@ -296,38 +315,15 @@ def vendor_leads():
         return redirect("/vendor/login")
 
     try:
-        sheet = connect_to_sheet("HelpoVendorSheet", "ContactLeads")
-        all_leads = sheet.get_all_records()
-
-        my_leads = [
-            {
-                "name": lead.get("user_name"),
-                "phone": lead.get("user_phone "),
-                "message": lead.get("message "),
-                "timestamp": lead.get("timestamp "),
-            }
-            for lead in all_leads
-            if str(lead.get("vendor_phone", "")).strip() == str(phone)
-        ]
-
-        # ✅ Sort by timestamp descending
-        for lead in my_leads:
-            try:
-                lead["timestamp_parsed"] = datetime.strptime(lead["timestamp"], "%Y-%m-%d %H:%M:%S")
-            except:
-                lead["timestamp_parsed"] = datetime.now()  # fallback
-
-        my_leads.sort(key=lambda x: x["timestamp_parsed"], reverse=True)
+        # ✅ Newest first, filtered by name or phone, one page at a time
+        search = request.args.get("search", "").strip()
+        page = max(1, request.args.get("page", 1, type=int))
+        per_page = config.LEADS_PAGE_SIZE
+        my_leads, total = get_leads().page(phone, search, offset=(page - 1) * per_page, limit=per_page)
+        pages = max(1, -(-total // per_page))
 
-        # ✅ Filter by search (name or phone)
-        search = request.args.get("search", "").strip().lower()
-        if search:
-            my_leads = [
-                lead for lead in my_leads
-                if search in str(lead["name"]).lower() or search in str(lead["phone"])
-            ]
-
-        return render_template("vendor_leads.html", leads=my_leads, active_tab="leads")
+        return render_template("vendor_leads.html", leads=my_leads, active_tab="leads",
+                               search=search, page=page, pages=pages, total=total)
 
     except Exception as e:
         print(f"Error fetching vendor leads: {e}")
@@ -350,13 +346,9 @@ def vendor_profile():
         return redirect("/vendor/login")
 
     phone = session["vendor_phone"]
-    sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    records = sheet.get_all_records()
-    print("📋 Records:", records)
 
-    # Locate vendor row in sheet (start=2 for 1-based index + header row)
-    row_index = next((i for i, v in enumerate(records, start=2)
-                      if str(v.get("phone", "")).strip() == str(phone).strip()), None)
+    # Locate vendor row in sheet (1-based, after the header row)
+    row_index, vendor = find_vendor(phone=phone)
 
     if request.method == "POST" and row_index:
         # Editable columns
@@ -376,15 +368,9 @@ def vendor_profile():
 
         for photo in uploaded_photos:
             if photo and photo.filename:
-                filename = secure_filename(photo.filename)
-                photo.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                new_photo_names.append(filename)
-
-        # Get existing vendor record
-        existing_vendor = next((v for v in records
-                                if str(v.get("phone", "")).strip() == str(phone).strip()), None)
+                new_photo_names.append(save_upload(photo))
 
-        existing_photos = existing_vendor.get("photos", "") if existing_vendor else ""
+        existing_photos = str(vendor.get("photos", ""))
         existing_photo_list = [p.strip() for p in existing_photos.split(",") if p.strip()]
         
         # 🗑 Get photos user wants to remove
@@ -392,23 +378,15 @@ def vendor_profile():
         
         # Final photo list = existing - removed + new uploads
         final_photos = [p for p in existing_photo_list if p not in remove_photos]
-        final_photos.extend(new_photo_names)
+        final_photos.extend(name for name in new_photo_names if name not in final_photos)
         updated_data["photos"] = ",".join(final_photos)
 
 
-        # Update sheet
-        for col_name, value in updated_data.items():
-            try:
-                col_number = list(records[0].keys()).index(col_name) + 1  # 1-based index
-                sheet.update_cell(row_index, col_number, value)
-            except ValueError:
-                print(f"⚠️ Column '{col_name}' not found in sheet.")
+        # Update sheet: changed cells only, in one batched call
+        update_row(config.VENDOR_SHEET, row_index, updated_data)
 
         return redirect("/vendor/profile")
 
-    # Load current vendor data
-    vendor = next((v for v in records
-                   if str(v.get("phone", "")).strip() == str(phone).strip()), None)
     print("✅ Vendor found:", vendor)
 
     return render_template("vendor_profile.html", vendor=vendor, active_tab="profile")
@@ -419,11 +397,7 @@ def vendor_logout():
     return redirect("/")
 
 def get_ads():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(config.GOOGLE_CREDENTIALS_FILE, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open(config.GOOGLE_SHEET_NAME).worksheet(config.ADS_SHEET)
-    return sheet.get_all_records()
+    return get_records(config.ADS_SHEET)
 
 @app.template_filter('todatetime')
 def todatetime(s, fmt="%Y-%m-%d %H:%M:%S"):
@@ -439,14 +413,9 @@ def vendor_login():
         identifier = request.form.get("identifier").strip()
         password = request.form.get("password").strip()
 
-        sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-        vendors = sheet.get_all_records()
-
         # Match phone or email
-        vendor = next(
-            (v for v in vendors if (str(v.get("phone")) == identifier or v.get("email", "").lower() == identifier.lower()) and v.get("password") == password),
-            None
-        )
+        candidates = (find_vendor(phone=identifier)[1], find_vendor(email=identifier)[1])
+        vendor = next((v for v in candidates if v and v.get("password") == password), None)
 
         if vendor:
             session["vendor_logged_in"] = True
@@ -478,33 +447,20 @@ def vendor_forgot_password():
             return render_template("vendor_forgot_password.html", error=error, email=email)
 
         try:
-            sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-            records = sheet.get_all_records()
-
             # Find the vendor by email
-            vendor_row_index = None
-            vendor_record = None
-            for i, record in enumerate(records):
-                if record.get("email", "").lower() == email.lower():
-                    # gspread rows are 1-based, and there's a header, so add 2
-                    vendor_row_index = i + 2
-                    vendor_record = record
-                    break
-            
+            vendor_row_index, vendor_record = find_vendor(email=email)
+
             if not vendor_row_index:
                 error = "No account found with that email address."
                 return render_template("vendor_forgot_password.html", error=error)
 
-            # Find the 'password' column index (1-based)
-            headers = sheet.row_values(1)
-            try:
-                password_col_index = headers.index("password") + 1
-            except ValueError:
+            # Make sure the sheet has a 'password' column
+            if "password" not in get_columns(config.VENDOR_SHEET):
                 error = "System configuration error: 'password' column not found."
                 return render_template("vendor_forgot_password.html", error=error)
 
             # --- Update the sheet ---
-            sheet.update_cell(vendor_row_index, password_col_index, new_password)
+            update_row(config.VENDOR_SHEET, vendor_row_index, {"password": new_password})
             
             message = "Your password has been updated successfully! You can now log in."
 
@@ -527,34 +483,13 @@ def submit_callback():
         return jsonify({"status": "error", "message": "Missing required fields"}), 400
 
     try:
-        sheet = connect_to_sheet("HelpoVendorSheet", "ContactLeads")
-        sheet.append_row([name, phone, message or "", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), vendor_phone])
+        row = [name, phone, message or "", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), vendor_phone]
+        queue_row(config.LEADS_SHEET, row)
         return jsonify({"status": "success", "message": "Callback request submitted."})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-def send_email_otp(to_email, otp):
-    import smtplib
-    from email.mime.text import MIMEText
-
-    msg = MIMEText(f"Your Helpo Services OTP is: {otp}")
-    msg["Subject"] = "Email OTP - Helpo Services"
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = to_email
-
-    try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, to_email, msg.as_string())
-        server.quit()
-    except Exception as e:
-        print("Email send failed:", e)
-        raise
-
-
-
 import random
 import traceback
 
@@ -592,9 +527,9 @@ def verify_email_otp_route():
         return jsonify({"status": "error", "message": "Invalid OTP"})
 
 from flask import jsonify
-from difflib import get_close_matches
 
 @app.route("/api/vendor_suggestions")
+@api_cached(lambda: cache.version(config.VENDOR_SHEET))
 def vendor_suggestions():
     query = request.args.get("q", "").lower()
     user_city = request.args.get("city", "").lower()
@@ -602,23 +537,13 @@ def vendor_suggestions():
     if not query:
         return jsonify([])
 
-    sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    vendors = sheet.get_all_records()
-
-    suggestions = set()
-    for v in vendors:
-        for field in ["business_name", "category", "city", "description"]:
-            value = v.get(field, "").lower()
-            if query in value or get_close_matches(query, [value], cutoff=0.7):
-                if not user_city or user_city in v.get("city", "").lower():
-                    suggestions.add(v.get("business_name"))
-
-    return jsonify(sorted(suggestions))
+    # Ranked by relevance from the prefix/trigram index built with the vendor snapshot
+    return jsonify(suggest_vendors(query, user_city))
 
 
 @app.context_processor
 def inject_now():
-    return {'now': datetime.now}
+    return {'now': datetime.now, 'image_url': image_url, 'vendor_card': vendor_card}
 
 # terms & conditions 
 @app.route("/terms")
@@ -659,13 +584,10 @@ def payment_success():
     phone = session["vendor_phone"]
 
     # Update subscription in Google Sheet
-    vendor_sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    vendors = vendor_sheet.get_all_records()
+    row_index, _ = find_vendor(phone=phone)
 
-    for i, v in enumerate(vendors):
-        if str(v.get("phone")).strip() == str(phone).strip():
-            vendor_sheet.update_cell(i + 2, YOUR_PLAN_COLUMN_INDEX, plan)
-            break
+    if row_index:
+        update_row(config.VENDOR_SHEET, row_index, {"subscription": plan})
 
     return redirect("/vendor/dashboard")
 
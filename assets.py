@@ -0,0 +1,149 @@
+"""Fingerprinted, precompressed static assets.
+
+At startup every file under static/ (except uploads, which are named by
+their content already) is hashed, and `url_for('static', filename=...)`
+rewrites e.g. styles.css to styles.3f2a1b9c.css. Those URLs change whenever
+the file does, so they are served with a year-long immutable Cache-Control;
+anything else gets `no-cache` and revalidates by ETag. Text assets are
+gzip- and brotli-compressed next to the original (styles.css.gz / .br) and
+the smallest variant the client accepts is sent.
+
+Precompress ahead of a deploy with:
+
+    python assets.py
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".xml", ".ico"}
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Upload names from uploads.save_upload are content hashes, so they never change either
+HASHED_UPLOAD = re.compile(r"(^|/)[0-9a-f]{32}(-\w+)?\.\w+$")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def precompress(path):
+    """Write path.gz and path.br unless they're already newer than path."""
+    source_mtime = os.path.getmtime(path)
+    data = None
+    for encoding, suffix in ENCODINGS:
+        target = path + suffix
+        if encoding == "br" and brotli is None:
+            continue
+        if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        compressed = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+        if len(compressed) < len(data):
+            _write_atomic(target, compressed)
+
+
+class AssetManifest:
+    def __init__(self, folder, skip=("uploads",)):
+        self.folder = folder
+        self.skip = skip
+        self.urls = {}  # real name -> fingerprinted name
+        self.files = {}  # fingerprinted name -> real name
+
+    def build(self, compress=True):
+        urls, files = {}, {}
+        for root, dirs, names in os.walk(self.folder):
+            if root == self.folder:
+                dirs[:] = [d for d in dirs if d not in self.skip]
+            for name in names:
+                if name.endswith((".gz", ".br", ".tmp")):
+                    continue
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:10]
+                stem, ext = os.path.splitext(relative)
+                fingerprinted = f"{stem}.{digest}{ext}"
+                urls[relative] = fingerprinted
+                files[fingerprinted] = relative
+                if compress and ext.lower() in COMPRESSIBLE and os.path.getsize(path) >= MIN_COMPRESS_SIZE:
+                    try:
+                        precompress(path)
+                    except OSError as e:  # read-only deploys still serve uncompressed
+                        print(f"Could not precompress {relative}:", e)
+        self.urls, self.files = urls, files
+        return self
+
+
+def _accepted(header):
+    """Encodings named in Accept-Encoding without q=0."""
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(token.lower())
+    return accepted
+
+
+def init_app(app):
+    """Take over the static endpoint: fingerprinted URLs, precompressed bodies, cache headers."""
+    manifest = AssetManifest(app.static_folder).build()
+
+    @app.url_defaults
+    def _fingerprint(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = manifest.urls.get(values["filename"], values["filename"])
+
+    def static(filename):
+        real = manifest.files.get(filename)
+        name = real or filename
+        path = safe_join(app.static_folder, name)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        body, encoding = path, None
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+            accepted = _accepted(request.headers.get("Accept-Encoding", ""))
+            for candidate, suffix in ENCODINGS:
+                if candidate in accepted and os.path.isfile(path + suffix):
+                    body, encoding = path + suffix, candidate
+                    break
+
+        response = send_file(body, mimetype=mimetype, conditional=True, max_age=None)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+            response.vary.add("Accept-Encoding")
+        if real or HASHED_UPLOAD.search(name):
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    app.view_functions["static"] = static
+    return manifest
+
+
+if __name__ == "__main__":
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    built = AssetManifest(static_folder).build()
+    for source, fingerprinted in sorted(built.urls.items()):
+        print(f"{source} -> {fingerprinted}")
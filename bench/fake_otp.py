@@ -0,0 +1,155 @@
+"""Local stand-ins for the 2Factor API and an SMTP server.
+
+Start both and point the app at them:
+
+    python -m bench.fake_otp --smtp-port 2525 --http-port 8025
+    TWOFACTOR_BASE_URL=http://127.0.0.1:8025/API/V1 SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_STARTTLS=0 python app.py
+
+`--delay` slows every reply down and `--drop-after N` makes the SMTP server
+hang up after N messages per connection, to exercise timeouts and reconnects.
+"""
+
+import argparse
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Speaks enough SMTP for smtplib (no STARTTLS); delivered messages land in `messages`."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, delay=0.0, drop_after=None):
+        self.delay = delay
+        self.drop_after = drop_after
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        super().__init__(address, _SMTPHandler)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        sent = 0
+        sender, recipients = None, []
+        self.reply("220 fake-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+            elif verb == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                for data in iter(self.rfile.readline, b""):
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    body.append(data.decode(errors="replace"))
+                with self.server.lock:
+                    self.server.messages.append((sender, recipients, "".join(body)))
+                sent += 1
+                self.reply("250 OK queued")
+                if self.server.drop_after and sent >= self.server.drop_after:
+                    return
+            elif verb in ("NOOP", "RSET"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeTwoFactorServer(ThreadingHTTPServer):
+    """Answers /API/V1/<key>/SMS/<phone>/AUTOGEN and /SMS/VERIFY/<session>/<otp>; every OTP is 123456."""
+
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0):
+        self.delay = delay
+        self.sessions = {}
+        self.requests = 0
+        super().__init__(address, _TwoFactorHandler)
+
+
+class _TwoFactorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.delay:
+            time.sleep(server.delay)
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 7 and parts[4] == "VERIFY":
+            matched = server.sessions.get(parts[5]) is not None and parts[6] == "123456"
+            result = {"Status": "Success", "Details": "OTP Matched"} if matched else \
+                {"Status": "Error", "Details": "OTP Mismatch"}
+        elif len(parts) == 6 and parts[5] == "AUTOGEN":
+            session_id = f"{random.getrandbits(64):016x}"
+            server.sessions[session_id] = parts[4]
+            result = {"Status": "Success", "Details": session_id}
+        else:
+            result = {"Status": "Error", "Details": "Invalid request"}
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--smtp-port", type=int, default=2525)
+    parser.add_argument("--http-port", type=int, default=8025)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before every reply")
+    parser.add_argument("--drop-after", type=int, default=None, help="hang up after N messages per connection")
+    args = parser.parse_args()
+
+    smtp = serve(FakeSMTPServer((args.host, args.smtp_port), args.delay, args.drop_after))
+    http = serve(FakeTwoFactorServer((args.host, args.http_port), args.delay))
+    print(f"SMTP on {args.host}:{args.smtp_port}, 2Factor on http://{args.host}:{args.http_port}/API/V1")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"{len(smtp.messages)} emails over {smtp.connections} connections, {http.requests} 2Factor calls")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
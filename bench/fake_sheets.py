@@ -0,0 +1,185 @@
+"""In-process stand-in for the gspread surface the app uses.
+
+FakeSpreadsheet holds tabs as lists of string rows and hands out
+FakeWorksheet objects with the same methods our code calls on gspread
+(get_all_records, get_all_values, get, append_row(s), update_cell, row_values,
+batch_get, batch_update, ...). Every call sleeps for the configured latency,
+counts towards per-(tab, op) stats and can fail with a 429 APIError once a
+per-minute read or write quota is spent, like the real API.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range, a1_to_rowcol, numericise_all
+
+READ_OPS = {"get_all_records", "get_all_values", "get", "row_values", "batch_get", "values_batch_get"}
+
+
+class _QuotaResponse:
+    """Just enough of a requests.Response for gspread's APIError."""
+
+    status_code = 429
+    text = "Quota exceeded"
+
+    def json(self):
+        return {"error": {"code": 429, "message": "Quota exceeded for quota metric 'Read requests'",
+                          "status": "RESOURCE_EXHAUSTED"}}
+
+
+class FakeSpreadsheet:
+    def __init__(self, tabs=None, latency=0.0, jitter=0.0, read_quota=None, write_quota=None):
+        self.tabs = {name: [list(map(str, row)) for row in rows] for name, rows in (tabs or {}).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.read_quota = read_quota    # calls per minute, None for unlimited
+        self.write_quota = write_quota
+        self.calls = Counter()          # (tab, op) -> count
+        self.bytes = Counter()          # tab -> approximate bytes returned
+        self.quota_errors = 0
+        self._lock = threading.Lock()
+        self._window = {"read": [], "write": []}
+        self._worksheets = {}
+
+    def worksheet(self, title):
+        if title not in self.tabs:
+            self.tabs[title] = []
+        worksheet = self._worksheets.get(title)
+        if worksheet is None:
+            worksheet = self._worksheets[title] = FakeWorksheet(self, title)
+        return worksheet
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def _call(self, tab, op, payload=None):
+        kind = "read" if op in READ_OPS else "write"
+        quota = self.read_quota if kind == "read" else self.write_quota
+        with self._lock:
+            self.calls[(tab, op)] += 1
+            if quota is not None:
+                now = time.time()
+                window = self._window[kind] = [t for t in self._window[kind] if now - t < 60]
+                if len(window) >= quota:
+                    self.quota_errors += 1
+                    raise APIError(_QuotaResponse())
+                window.append(now)
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if payload is not None:
+            with self._lock:
+                self.bytes[tab] += sum(len(cell) for row in payload for cell in row)
+        return payload
+
+    def values_batch_get(self, ranges, params=None):
+        value_ranges = []
+        for name in ranges:
+            title, _, cells = name.partition("!")
+            title = title.strip("'")
+            values = self.worksheet(title)._range(cells or None)
+            value_ranges.append({"range": name, "values": values})
+        self._call(",".join(r.partition("!")[0] for r in ranges), "values_batch_get",
+                   [row for vr in value_ranges for row in vr["values"]])
+        return {"valueRanges": value_ranges}
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+
+    @property
+    def rows(self):
+        return self.spreadsheet.tabs[self.title]
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self.rows), default=0)
+
+    def _range(self, cells):
+        if not cells:
+            return [list(row) for row in self.rows]
+        if ":" not in cells:
+            cells = f"{cells}:{cells}"
+        grid = a1_range_to_grid_range(cells)
+        start_row = grid.get("startRowIndex", 0)
+        end_row = grid.get("endRowIndex", len(self.rows))
+        start_col = grid.get("startColumnIndex", 0)
+        end_col = grid.get("endColumnIndex")
+        return [list(row[start_col:end_col]) for row in self.rows[start_row:end_row]]
+
+    def get_all_values(self, **kwargs):
+        return self.spreadsheet._call(self.title, "get_all_values", [list(row) for row in self.rows])
+
+    def get_all_records(self, **kwargs):
+        values = self.spreadsheet._call(self.title, "get_all_records", [list(row) for row in self.rows])
+        if not values:
+            return []
+        headers = values[0]
+        return [dict(zip(headers, numericise_all(row + [""] * (len(headers) - len(row))))) for row in values[1:]]
+
+    def get(self, range_name=None, **kwargs):
+        return self.spreadsheet._call(self.title, "get", self._range(range_name))
+
+    def row_values(self, row, **kwargs):
+        values = self.rows[row - 1] if row <= len(self.rows) else []
+        return self.spreadsheet._call(self.title, "row_values", [list(values)])[0]
+
+    def batch_get(self, ranges, **kwargs):
+        result = [self._range(r) for r in ranges]
+        self.spreadsheet._call(self.title, "batch_get", [row for values in result for row in values])
+        return result
+
+    def append_row(self, values, **kwargs):
+        self.spreadsheet._call(self.title, "append_row")
+        self.rows.append([str(v) for v in values])
+
+    def append_rows(self, values, **kwargs):
+        self.spreadsheet._call(self.title, "append_rows")
+        self.rows.extend([str(v) for v in row] for row in values)
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = str(value)
+
+    def update_cell(self, row, col, value):
+        self.spreadsheet._call(self.title, "update_cell")
+        self._set(row, col, value)
+
+    def batch_update(self, data, **kwargs):
+        self.spreadsheet._call(self.title, "batch_update")
+        for item in data:
+            row, col = a1_to_rowcol(item["range"].split(":")[0])
+            for r, values in enumerate(item["values"]):
+                for c, value in enumerate(values):
+                    self._set(row + r, col + c, value)
+
+    def update(self, range_name, values=None, **kwargs):
+        self.spreadsheet._call(self.title, "update")
+        row, col = a1_to_rowcol(range_name.split(":")[0])
+        for r, cells in enumerate(values or []):
+            for c, value in enumerate(cells):
+                self._set(row + r, col + c, value)
+
+    def clear(self):
+        self.spreadsheet._call(self.title, "clear")
+        del self.rows[:]
+
+    def resize(self, rows=None, cols=None):
+        self.spreadsheet._call(self.title, "resize")
+        if rows is not None:
+            del self.rows[rows:]
+        if cols is not None:
+            for row in self.rows:
+                del row[cols:]
@@ -0,0 +1,171 @@
+"""Route-level load test against an in-process fake spreadsheet.
+
+Seeds the fake with N vendors (plus 3N reviews and 2N leads), points the app's
+storage backend at it and drives each route from several threads through
+Flask's test client, reporting latency percentiles, throughput and Sheets
+calls per request:
+
+    python -m bench.routes --sizes 1000 10000 --requests 300 --concurrency 8 --latency 0.05
+
+Use --cold to drop the snapshot cache before every route, --read-quota /
+--write-quota to simulate per-minute API quotas.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_sheets import FakeSpreadsheet  # noqa: E402
+
+CATEGORIES = ["Plumber", "Electrician", "Carpenter", "Painter", "Cleaner", "AC Repair", "Pest Control", "Tutor"]
+CITIES = ["Bangalore", "Mysore", "Pune", "Chennai", "Hyderabad", "Mumbai", "Delhi", "Kochi"]
+SYLLABLES = ["ra", "ma", "shri", "kan", "vel", "dev", "sai", "pro", "fix", "tech", "home", "care", "star"]
+
+
+def _name(rng):
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title() for _ in range(2))
+
+
+def seed(vendors, rng):
+    """Tab rows for `vendors` vendors, 3 reviews and 2 leads per vendor on average."""
+    import config
+    from storage import DEFAULT_HEADERS
+
+    phones = [str(6000000000 + i) for i in range(vendors)]
+    vendor_rows = [DEFAULT_HEADERS[config.VENDOR_SHEET]]
+    for i, phone in enumerate(phones):
+        day = 1 + i % 28
+        vendor_rows.append([
+            _name(rng), str(560000 + i % 100), rng.choice(CITIES), "KA", str(i), "", "Main Road", "", "Area",
+            rng.choice(CATEGORIES), phone, "", "Quick and reliable service", "9am-6pm", f"vendor{i}@example.com",
+            "secret", "secret", rng.choice(["free", "Basic", "Standard", "Premium"]),
+            f"2025-01-{day:02d} 10:00:00", f"2025-01-{day:02d} 10:00:00",
+        ])
+    review_rows = [DEFAULT_HEADERS[config.REVIEW_SHEET]]
+    for _ in range(vendors * 3):
+        review_rows.append([rng.choice(phones), "User", str(rng.randint(1, 5)), "", "Good work", "2025-02-01 12:00:00"])
+    lead_rows = [DEFAULT_HEADERS[config.LEADS_SHEET]]
+    for i in range(vendors * 2):
+        lead_rows.append([f"Lead {i}", "9876543210", "Please call", f"2025-03-{1 + i % 28:02d} 09:00:00",
+                          rng.choice(phones)])
+    ads = [DEFAULT_HEADERS[config.ADS_SHEET], ["Festive offer", "ad.jpg", "/"]]
+    tabs = {config.VENDOR_SHEET: vendor_rows, config.REVIEW_SHEET: review_rows,
+            config.LEADS_SHEET: lead_rows, config.ADS_SHEET: ads}
+    return tabs, phones
+
+
+def scenarios(phones, rng):
+    """(route label, callable(client)) pairs; each callable makes one request."""
+    def get(path):
+        return lambda client: client.get(path() if callable(path) else path)
+
+    def leads(client):
+        with client.session_transaction() as sess:
+            sess["vendor_logged_in"] = True
+            sess["vendor_phone"] = rng.choice(phones)
+        return client.get("/vendor/leads")
+
+    def callback(client):
+        return client.post("/submit_callback", data={
+            "user_name": "Bench", "user_phone": "9876543210", "message": "hi", "vendor_phone": rng.choice(phones)})
+
+    return [
+        ("/", get(lambda: f"/?query={rng.choice(CATEGORIES).lower()[:4]}")),
+        ("/api/vendors", get(lambda: f"/api/vendors?category={rng.choice(CATEGORIES)}&sort=rating")),
+        ("/api/vendor_suggestions", get(lambda: f"/api/vendor_suggestions?q={rng.choice(SYLLABLES)}{rng.choice(SYLLABLES)}")),
+        ("/vendor/<phone>", get(lambda: f"/vendor/{rng.choice(phones)}")),
+        ("/vendor/leads", leads),
+        ("/submit_callback", callback),
+    ]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_route(app, request, requests, concurrency):
+    local = threading.local()
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        started = time.perf_counter()
+        response = request(client)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake Sheets call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--read-quota", type=int, default=None, help="read calls per minute")
+    parser.add_argument("--write-quota", type=int, default=None, help="write calls per minute")
+    parser.add_argument("--routes", nargs="+", default=None, help="only run these route labels")
+    parser.add_argument("--cold", action="store_true", help="drop cached snapshots before each route")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Keep the benchmark's journal away from the real one and flush it quickly
+    workdir = tempfile.mkdtemp(prefix="helpo-bench-")
+    os.environ.setdefault("WRITE_QUEUE_PATH", os.path.join(workdir, "write_queue.sqlite3"))
+    os.environ.setdefault("WRITE_FLUSH_INTERVAL", "0.2")
+    os.environ["STORAGE_BACKEND"] = "sheets"
+
+    import google_sheets
+    from app import app
+    from storage import SheetsStorage
+
+    rng = random.Random(args.seed)
+    print(f"{'vendors':>8} {'route':<26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'calls/req':>9} {'5xx':>5}")
+    for size in args.sizes:
+        tabs, phones = seed(size, rng)
+        fake = FakeSpreadsheet(tabs, latency=args.latency, jitter=args.jitter,
+                               read_quota=args.read_quota, write_quota=args.write_quota)
+        google_sheets.backend = google_sheets.delta.backend = SheetsStorage(fake.worksheet, google_sheets.scheduler)
+        google_sheets.delta.reset()
+        google_sheets.cache.invalidate()
+
+        for label, request in scenarios(phones, rng):
+            if args.routes and label not in args.routes:
+                continue
+            if args.cold:
+                google_sheets.delta.reset()
+                google_sheets.cache.invalidate()
+            calls_before = fake.total_calls()
+            latencies, errors, wall = run_route(app, request, args.requests, args.concurrency)
+            calls = fake.total_calls() - calls_before
+            print(f"{size:>8} {label:<26} {percentile(latencies, 50) * 1000:>8.1f} "
+                  f"{percentile(latencies, 95) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+                  f"{len(latencies) / wall:>8.1f} {calls / len(latencies):>9.3f} {errors:>5}")
+        if fake.quota_errors:
+            print(f"{size:>8} quota errors: {fake.quota_errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,16 @@ SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "helpo_admin_secret_2025")
 # Upload folder
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "static/uploads")
 
+# Resized photo variants: size name -> longest side in pixels, encoder quality,
+# and whether to serve the WebP copy when there is one
+IMAGE_SIZES = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIZE", "160")),
+    "card": int(os.getenv("IMAGE_CARD_SIZE", "480")),
+    "large": int(os.getenv("IMAGE_LARGE_SIZE", "1280")),
+}
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "82"))
+IMAGE_WEBP = os.getenv("IMAGE_WEBP", "1") == "1"
+
 # TwoFactor API Key
 TWOFACTOR_API_KEY = os.getenv("TWOFACTOR_API_KEY", "abd4d443-71bd-11f0-a562-0200cd936042")
 
@@ -13,6 +23,18 @@ TWOFACTOR_API_KEY = os.getenv("TWOFACTOR_API_KEY", "abd4d443-71bd-11f0-a562-0200
 SENDER_EMAIL = os.getenv("SENDER_EMAIL", "harishprogram.py@gmail.com")
 SENDER_PASSWORD = os.getenv("SENDER_PASSWORD", "fkkf vlvo rwik mbjx")
 
+# 2Factor endpoint and connect/read timeouts (seconds)
+TWOFACTOR_BASE_URL = os.getenv("TWOFACTOR_BASE_URL", "https://2factor.in/API/V1")
+TWOFACTOR_CONNECT_TIMEOUT = float(os.getenv("TWOFACTOR_CONNECT_TIMEOUT", "3"))
+TWOFACTOR_TIMEOUT = float(os.getenv("TWOFACTOR_TIMEOUT", "5"))
+
+# SMTP server for OTP email, pooled connections (and sender threads) and socket timeout
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+
 # Google Sheets config
 GOOGLE_CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json")
 GOOGLE_SHEET_NAME = os.getenv("GOOGLE_SHEET_NAME", "HelpoVendorSheet")
@@ -21,6 +43,90 @@ REVIEW_SHEET = os.getenv("REVIEW_SHEET", "VendorReviews")
 LEADS_SHEET = os.getenv("LEADS_SHEET", "ContactLeads")
 ADS_SHEET = os.getenv("ADS_SHEET", "Ads")
 
+# Storage backend: "sheets" (the live spreadsheet) or "sqlite" (a local file at SQLITE_PATH)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "helpo.sqlite3")
+
+# Shared Sheets client: keep-alive pool size and how early (seconds) to refresh the token
+SHEETS_HTTP_POOL_SIZE = int(os.getenv("SHEETS_HTTP_POOL_SIZE", "10"))
+SHEETS_TOKEN_REFRESH_MARGIN = int(os.getenv("SHEETS_TOKEN_REFRESH_MARGIN", "300"))
+
+# Sheets quota scheduler: requests per minute this process may send (0 = unlimited),
+# token-bucket burst, and attempts / longest backoff (seconds) after a 429 for
+# background writes; calls made for a request get fewer attempts and a total deadline.
+# With several gunicorn workers, divide the project quota between them.
+SHEETS_READ_QUOTA = int(os.getenv("SHEETS_READ_QUOTA", "60"))
+SHEETS_WRITE_QUOTA = int(os.getenv("SHEETS_WRITE_QUOTA", "60"))
+SHEETS_BURST = int(os.getenv("SHEETS_BURST", "10"))
+SHEETS_RETRY_ATTEMPTS = int(os.getenv("SHEETS_RETRY_ATTEMPTS", "5"))
+SHEETS_RETRY_MAX_DELAY = float(os.getenv("SHEETS_RETRY_MAX_DELAY", "32"))
+SHEETS_REQUEST_ATTEMPTS = int(os.getenv("SHEETS_REQUEST_ATTEMPTS", "2"))
+SHEETS_REQUEST_DEADLINE = float(os.getenv("SHEETS_REQUEST_DEADLINE", "10"))
+
+# Tab snapshot cache TTL in seconds, with per-tab overrides
+SHEET_CACHE_TTL = int(os.getenv("SHEET_CACHE_TTL", "60"))
+SHEET_CACHE_TTLS = {
+    ADS_SHEET: int(os.getenv("ADS_CACHE_TTL", "300")),
+}
+
+# Background refresh interval (0 disables the refresher) and how long past its
+# TTL a snapshot may still be served before reads fail hard
+SHEET_REFRESH_INTERVAL = int(os.getenv("SHEET_REFRESH_INTERVAL", "30"))
+SHEET_MAX_STALE = int(os.getenv("SHEET_MAX_STALE", "600"))
+SHEET_MAX_STALES = {
+    ADS_SHEET: int(os.getenv("ADS_MAX_STALE", "3600")),
+}
+
+# Read VendorReviews and ContactLeads incrementally (only rows added since the last
+# load), re-reading them in full every SHEET_FULL_RESYNC_INTERVAL seconds to pick up hand edits
+SHEET_DELTA_SYNC = os.getenv("SHEET_DELTA_SYNC", "1") == "1"
+SHEET_FULL_RESYNC_INTERVAL = int(os.getenv("SHEET_FULL_RESYNC_INTERVAL", "900"))
+
+# Threads for loading several tabs at once when they can't share one batched read
+SHEET_LOAD_WORKERS = int(os.getenv("SHEET_LOAD_WORKERS", "4"))
+
+# Directory where worker processes share loaded tab snapshots (e.g. /dev/shm/helpo-snapshots);
+# empty keeps every worker's cache to itself. gunicorn.conf.py sets one up.
+SHARED_SNAPSHOT_DIR = os.getenv("SHARED_SNAPSHOT_DIR", "")
+
+# /api/vendor_suggestions: max results and the share of query trigrams a fuzzy match must contain
+SUGGESTION_LIMIT = int(os.getenv("SUGGESTION_LIMIT", "10"))
+SUGGESTION_MIN_SIMILARITY = float(os.getenv("SUGGESTION_MIN_SIMILARITY", "0.5"))
+
+# Near-me search: CSV of pincode,latitude,longitude (e.g. the India Post pincode
+# directory export), grid cell size in degrees, and the largest radius a client may ask for
+PINCODE_TABLE = os.getenv("PINCODE_TABLE", "pincodes.csv")
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", "0.1"))
+GEO_MAX_RADIUS_KM = float(os.getenv("GEO_MAX_RADIUS_KM", "200"))
+
+# Vendor listing page size for / and /api/vendors, and the most a client may ask for
+LISTING_PAGE_SIZE = int(os.getenv("LISTING_PAGE_SIZE", "20"))
+LISTING_MAX_PAGE_SIZE = int(os.getenv("LISTING_MAX_PAGE_SIZE", "100"))
+
+# Leads shown per page on /vendor/leads
+LEADS_PAGE_SIZE = int(os.getenv("LEADS_PAGE_SIZE", "25"))
+
+# Rendered vendor cards and detail blocks kept per process (least recently used go first)
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "5000"))
+
+# Browser/CDN caching of /api/vendors, /api/vendor_suggestions and /vendor/<phone>:
+# fresh for max-age seconds, then served stale for up to stale-while-revalidate while
+# revalidating (responses carry an ETag from the data version, so that's usually a 304)
+API_CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", "30"))
+API_STALE_WHILE_REVALIDATE = int(os.getenv("API_STALE_WHILE_REVALIDATE", "300"))
+
+# Write-behind journal for leads and reviews: SQLite file, rows per append_rows call,
+# flush interval and the longest retry backoff (seconds)
+WRITE_QUEUE_PATH = os.getenv("WRITE_QUEUE_PATH", "write_queue.sqlite3")
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))
+WRITE_RETRY_MAX_DELAY = float(os.getenv("WRITE_RETRY_MAX_DELAY", "300"))
+
+# Metrics: add a Server-Timing header to every response, and an optional bearer
+# token that lets a Prometheus scraper read /metrics without an admin session
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Admin credentials (for demo only; use proper authentication in production)
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "password123")
@@ -0,0 +1,81 @@
+"""Rendered template fragments, reused while the data behind them is unchanged.
+
+A page is mostly one fragment per vendor (its listing card, its detail
+block, its review list), and rendering those dominates a request once the
+data is cached. `FragmentCache.render` keeps the last HTML rendered for each
+(kind, vendor) with the version it was rendered from: a tuple of the values
+the fragment shows, so a fragment is re-rendered exactly when one of them
+changed, in whichever worker notices first. Write paths also drop the
+vendor's fragments outright (`invalidate`), and the least recently used
+entries go once there are more than `max_entries`.
+"""
+
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+import config
+import metrics
+from indexes import normalize_phone
+
+
+class FragmentCache:
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (kind, vendor phone) -> (version, html)
+        self._kinds = set()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, kind, phone, version, build):
+        """HTML for `kind` of vendor `phone` at `version`; `build()` renders it when that isn't cached."""
+        key = (kind, normalize_phone(phone))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return Markup(entry[1])
+            self.misses += 1
+
+        html = str(build())
+        with self._lock:
+            self._kinds.add(kind)
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return Markup(html)
+
+    def invalidate(self, phone):
+        """Drop every fragment of vendor `phone` (this process only; other workers go by version)."""
+        phone = normalize_phone(phone)
+        with self._lock:
+            for kind in self._kinds:
+                self._entries.pop((kind, phone), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+fragments = FragmentCache(config.FRAGMENT_CACHE_SIZE)
+
+
+def fragment_metrics():
+    lines = []
+    for name, kind, help, value in (
+        ("helpo_fragment_cache_hits_total", "counter", "Fragments served from the cache.", fragments.hits),
+        ("helpo_fragment_cache_misses_total", "counter", "Fragments rendered.", fragments.misses),
+        ("helpo_fragment_cache_entries", "gauge", "Rendered fragments held.", len(fragments)),
+    ):
+        lines.extend(metrics.family(name, help, kind, [({}, value)]))
+    return lines
+
+
+metrics.collectors.append(fragment_metrics)
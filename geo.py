@@ -0,0 +1,213 @@
+"""Pincode coordinates and a grid index for "near me" vendor search.
+
+Vendors carry a pincode, not coordinates, so positions come from an offline
+pincode -> (lat, lon) table loaded once per process (see `load_pincodes`).
+`GeoIndex` buckets the distinct pincodes that have vendors into a grid of
+`cell_degrees` cells and answers nearest-first queries by scanning rings of
+cells outward from the query point, so a search only touches the cells
+around it instead of every vendor.
+"""
+
+import csv
+import heapq
+import math
+import os
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Header names accepted for each column (compared lowercased), e.g. the India
+# Post "All India Pincode Directory" export uses pincode/latitude/longitude
+PINCODE_COLUMNS = ("pincode", "pin", "postal_code")
+LAT_COLUMNS = ("lat", "latitude")
+LON_COLUMNS = ("lon", "lng", "long", "longitude")
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def normalize_pincode(value):
+    text = str(value if value is not None else "").strip()
+    return text[:-2] if text.endswith(".0") else text
+
+
+def load_pincodes(path):
+    """pincode -> (lat, lon) from a CSV; offices sharing a pincode are averaged."""
+    if not path or not os.path.exists(path):
+        print(f"Pincode table {path!r} not found; near-me search is disabled.")
+        return {}
+
+    sums = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        pick = lambda names: next((fields[n] for n in names if n in fields), None)  # noqa: E731
+        pin_col, lat_col, lon_col = pick(PINCODE_COLUMNS), pick(LAT_COLUMNS), pick(LON_COLUMNS)
+        if not (pin_col and lat_col and lon_col):
+            print(f"Pincode table {path!r} needs pincode, latitude and longitude columns.")
+            return {}
+        for row in reader:
+            try:
+                lat, lon = float(row[lat_col]), float(row[lon_col])
+            except (TypeError, ValueError):
+                continue  # "NA" and blanks
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+            pincode = normalize_pincode(row[pin_col])
+            total = sums.setdefault(pincode, [0.0, 0.0, 0])
+            total[0] += lat
+            total[1] += lon
+            total[2] += 1
+    return {pincode: (lat / n, lon / n) for pincode, (lat, lon, n) in sums.items()}
+
+
+class GeoIndex:
+    """Grid of pincode points, each holding the indexes of its vendors.
+
+    Searches walk an index without locking, so a published one never
+    changes: patches go to a `copy()`, whose cell sets and point dicts are
+    still the original's and get replaced rather than changed.
+    """
+
+    __slots__ = ("pincodes", "cell_degrees", "cells", "points", "vendor_pincodes", "copied")
+
+    def __init__(self, pincodes, cell_degrees=0.1):
+        self.pincodes = pincodes
+        self.cell_degrees = cell_degrees
+        self.cells = {}  # (row, col) -> {pincode}
+        self.points = {}  # pincode -> (lat, lon, {vendor index: None})
+        self.vendor_pincodes = {}  # vendor index -> pincode
+        self.copied = False  # inner sets and dicts are shared with the index this was copied from
+
+    def copy(self):
+        index = GeoIndex(self.pincodes, self.cell_degrees)
+        index.cells = dict(self.cells)
+        index.points = dict(self.points)
+        index.vendor_pincodes = dict(self.vendor_pincodes)
+        index.copied = True
+        return index
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def _point_vendors(self, pincode):
+        # The vendors dict of one point, ready to change
+        lat, lon, vendors = self.points[pincode]
+        if self.copied:
+            vendors = dict(vendors)
+            self.points[pincode] = (lat, lon, vendors)
+        return vendors
+
+    def add(self, index, record):
+        pincode = normalize_pincode(record.get("pincode"))
+        position = self.pincodes.get(pincode)
+        if position is None:
+            return
+        if pincode in self.points:
+            self._point_vendors(pincode)[index] = None
+        else:
+            self.points[pincode] = (position[0], position[1], {index: None})
+            cell = self._cell(*position)
+            if self.copied:
+                self.cells[cell] = self.cells.get(cell, frozenset()) | {pincode}
+            else:
+                self.cells.setdefault(cell, set()).add(pincode)
+        self.vendor_pincodes[index] = pincode
+
+    def discard(self, index):
+        pincode = self.vendor_pincodes.pop(index, None)
+        if pincode is None:
+            return
+        vendors = self._point_vendors(pincode)
+        vendors.pop(index, None)
+        if not vendors:
+            lat, lon, _ = self.points.pop(pincode)
+            cell = self._cell(lat, lon)
+            pincodes = self.cells[cell] - {pincode}
+            if pincodes:
+                self.cells[cell] = pincodes
+            else:
+                del self.cells[cell]
+
+    def locate(self, index):
+        pincode = self.vendor_pincodes.get(index)
+        return self.points[pincode][:2] if pincode else None
+
+    def _ring(self, center, radius):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+    def nearest(self, lat, lon, max_km=None):
+        """Yield (vendor index, km) nearest first, optionally only within `max_km`."""
+        center = self._cell(lat, lon)
+        remaining = len(self.points)
+        heap = []
+        radius = 0
+        while remaining or heap:
+            # Once the rings walked cover more cells than the grid holds, visiting
+            # every cell not seen yet is cheaper than walking (mostly empty) rings
+            sweep = (2 * radius + 1) ** 2 > len(self.cells)
+            if remaining:
+                if sweep:
+                    cells = [cell for cell in self.cells
+                             if max(abs(cell[0] - center[0]), abs(cell[1] - center[1])) >= radius]
+                else:
+                    cells = self._ring(center, radius)
+                for cell in cells:
+                    for pincode in self.cells.get(cell, ()):
+                        remaining -= 1
+                        p_lat, p_lon, _ = self.points[pincode]
+                        km = haversine_km(lat, lon, p_lat, p_lon)
+                        if max_km is None or km <= max_km:
+                            heapq.heappush(heap, (km, pincode))
+                if sweep:
+                    remaining = 0
+            # Anything in rings beyond this one is at least this far away; a cell
+            # spans fewer km east-west the further it is from the equator
+            edge_lat = min(89.0, abs(lat) + (radius + 1) * self.cell_degrees)
+            bound = radius * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+            while heap and (not remaining or heap[0][0] <= bound):
+                km, pincode = heapq.heappop(heap)
+                for index in list(self.points.get(pincode, (0, 0, {}))[2]):
+                    yield index, km
+            if max_km is not None and bound > max_km:
+                remaining = 0
+            radius += 1
+
+
+class GeoView:
+    """SnapshotCache view: a GeoIndex over the vendor tab."""
+
+    shared = False  # holds the whole pincode table; each worker builds its own
+
+    def __init__(self, pincodes, cell_degrees=0.1):
+        self.pincodes = pincodes
+        self.cell_degrees = cell_degrees
+
+    def build(self, records):
+        index = GeoIndex(self.pincodes, self.cell_degrees)
+        for i, record in enumerate(records):
+            index.add(i, record)
+        return index
+
+    def append(self, index, position, record):
+        index = index.copy()
+        index.add(position, record)
+        return index
+
+    def update(self, index, position, old, new):
+        index = index.copy()
+        index.discard(position)
+        index.add(position, new)
+        return index
@@ -1,18 +1,368 @@
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
 import gspread
+import requests
+from google.auth.transport.requests import Request
 from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+
+import config
+import geo
+import metrics
+import quota
+from fragments import fragments
+from indexes import NO_RATINGS, ColumnMap, LeadIndex, RatingIndex, ReviewIndex, VendorIndex, normalize_phone
+from ranking import RankingView
+from records import Columns, Record
+from search import SuggestionView, query_vendors
+from sheet_cache import SnapshotCache
+from snapshot_store import SnapshotStore
+from storage import DeltaSync, create_storage
+from write_queue import WriteBehindQueue
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+
+class SheetClientManager:
+    """One authorized gspread client per process, shared by every route.
+
+    Spreadsheet and worksheet handles are cached by (sheet, tab) so a request
+    never re-opens the spreadsheet, and the access token is refreshed ahead of
+    its expiry instead of failing mid-request.
+    """
+
+    def __init__(self, credentials_file, pool_size=10, refresh_margin=300):
+        self.credentials_file = credentials_file
+        self.pool_size = pool_size
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._lock = threading.RLock()
+        self._client = None
+        self._auth_request = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._pid = os.getpid()
+
+    def client(self):
+        with self._lock:
+            if self._pid != os.getpid():  # forked (gunicorn preload): the parent's sockets aren't ours
+                self.reset()
+            if self._client is None:
+                creds = ServiceAccountCredentials.from_json_keyfile_name(self.credentials_file, SCOPE)
+                client = gspread.authorize(creds)
+                # Keep-alive pool sized for the worker's threads
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                client.session.mount("https://", adapter)
+                client.session.hooks["response"].append(metrics.record_http_bytes)
+                self._client = client
+                self._auth_request = Request(requests.Session())
+            self._refresh_if_needed()
+            return self._client
+
+    def _refresh_if_needed(self):
+        auth = self._client.auth
+        expiry = getattr(auth, "expiry", None)
+        if not auth.token or expiry is None or expiry - datetime.utcnow() < self.refresh_margin:
+            auth.refresh(self._auth_request)
+
+    def spreadsheet(self, sheet_name):
+        with self._lock:
+            client = self.client()
+            spreadsheet = self._spreadsheets.get(sheet_name)
+            if spreadsheet is None:
+                spreadsheet = self._spreadsheets[sheet_name] = client.open(sheet_name)
+            return spreadsheet
+
+    def worksheet(self, sheet_name, tab_name):
+        key = (sheet_name, tab_name)
+        with self._lock:
+            worksheet = self._worksheets.get(key) if self._pid == os.getpid() else None
+            if worksheet is None:
+                worksheet = self._worksheets[key] = self.spreadsheet(sheet_name).worksheet(tab_name)
+            else:
+                self.client()  # keeps the shared token fresh
+            return worksheet
+
+    def reset(self):
+        """Drop the client and every cached handle; the next call re-authorizes."""
+        with self._lock:
+            self._client = None
+            self._auth_request = None
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+            self._pid = os.getpid()
+
+
+sheets = SheetClientManager(
+    config.GOOGLE_CREDENTIALS_FILE,
+    pool_size=config.SHEETS_HTTP_POOL_SIZE,
+    refresh_margin=config.SHEETS_TOKEN_REFRESH_MARGIN,
+)
+
 
 def connect_to_sheet(sheet_name, tab_name):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-    client = gspread.authorize(creds)
-    sheet = client.open(sheet_name).worksheet(tab_name)
-    return sheet
+    return sheets.worksheet(sheet_name, tab_name)
+
+
+# Every Sheets call is rate limited, coalesced and retried here
+scheduler = quota.SheetsScheduler(
+    config.SHEETS_READ_QUOTA,
+    config.SHEETS_WRITE_QUOTA,
+    burst=config.SHEETS_BURST,
+    attempts=config.SHEETS_RETRY_ATTEMPTS,
+    backoff_max=config.SHEETS_RETRY_MAX_DELAY,
+    foreground_attempts=config.SHEETS_REQUEST_ATTEMPTS,
+    foreground_deadline=config.SHEETS_REQUEST_DEADLINE,
+)
+
+# Where the data lives: the spreadsheet, or a local SQLite file (config.STORAGE_BACKEND)
+backend = create_storage(
+    config.STORAGE_BACKEND,
+    worksheet=lambda tab_name: connect_to_sheet(config.GOOGLE_SHEET_NAME, tab_name),
+    sqlite_path=config.SQLITE_PATH,
+    scheduler=scheduler,
+)
+
+
+def write_rows(tab_name, rows):
+    # Called by the write-behind flusher: no request waits on it, so a 429 gets the long backoff
+    with quota.background():
+        backend.append_rows(tab_name, rows)
+
+
+writes = WriteBehindQueue(
+    config.WRITE_QUEUE_PATH,
+    write_rows,
+    batch_size=config.WRITE_BATCH_SIZE,
+    flush_interval=config.WRITE_FLUSH_INTERVAL,
+    backoff_max=config.WRITE_RETRY_MAX_DELAY,
+)
+# The flusher starts on the first enqueue or pending() in each process (see
+# gunicorn.conf.py's post_fork), never at import: under preload_app that would
+# start it in the master, and workers forked while it holds a lock deadlock.
+
+# Vendor columns never shown outside the vendor's own account
+PRIVATE_VENDOR_FIELDS = ("password", "confirm_password")
+
+# Append-only tabs whose rows go through the write-behind queue
+WRITE_BEHIND_TABS = (config.REVIEW_SHEET, config.LEADS_SHEET)
+
+# ...and so can be read incrementally: only rows added since the last load
+delta = DeltaSync(backend, WRITE_BEHIND_TABS if config.SHEET_DELTA_SYNC else (),
+                  full_interval=config.SHEET_FULL_RESYNC_INTERVAL)
+
+
+def load_records(tab_name):
+    pending = _pending(tab_name)
+    return _with_pending(tab_name, delta.load_records(tab_name), pending)
+
+
+def load_many(tab_names):
+    """{tab: records} for several tabs from a single batched read."""
+    pending = {tab: _pending(tab) for tab in tab_names}
+    return {tab: _with_pending(tab, records, pending[tab]) for tab, records in delta.load_many(tab_names).items()}
+
+
+def _pending(tab_name):
+    # Rows still waiting in the journal belong in the snapshot too. Read before
+    # the sheet, so a row the flusher writes meanwhile is in one or both lists.
+    return writes.pending(tab_name) if tab_name in WRITE_BEHIND_TABS else []
+
+
+def _with_pending(tab_name, records, pending):
+    """`records` plus the `pending` rows the sheet read didn't already return."""
+    if not pending:
+        return records
+    columns = records[0].columns if records else Columns.of(backend.headers(tab_name))
+    rows = [Record.from_row(columns, row) for row in pending]
+    # Rows flushed while we read are at the end of the sheet, but not yet out of the journal
+    journaled = Counter(row.values for row in rows)
+    written, left = Counter(), len(rows)
+    for record in reversed(records):
+        if not left:
+            break
+        if written[record.values] < journaled[record.values]:
+            written[record.values] += 1
+            left -= 1
+    for row in rows:
+        if written[row.values]:
+            written[row.values] -= 1
+        else:
+            records.append(row)
+    return records
+
+
+
+def create_snapshot_store(directory):
+    if not directory:
+        return None
+    try:
+        return SnapshotStore(directory)
+    except (OSError, ValueError) as e:
+        print("Shared snapshots disabled:", e)
+        return None
+
+
+cache = SnapshotCache(
+    load_records,
+    ttl=config.SHEET_CACHE_TTL,
+    ttls=config.SHEET_CACHE_TTLS,
+    max_stale=config.SHEET_MAX_STALE,
+    max_stales=config.SHEET_MAX_STALES,
+    refresh_interval=config.SHEET_REFRESH_INTERVAL,
+    background=quota.background,
+    append_only=WRITE_BEHIND_TABS,
+    batch_loader=load_many,
+    max_parallel=config.SHEET_LOAD_WORKERS,
+    store=create_snapshot_store(config.SHARED_SNAPSHOT_DIR),
+)
+cache.register_view(config.VENDOR_SHEET, "lookup", VendorIndex())
+cache.register_view(config.VENDOR_SHEET, "suggestions", SuggestionView())
+cache.register_view(config.VENDOR_SHEET, "ranking", RankingView(lambda: get_ratings()))
+cache.register_view(config.VENDOR_SHEET, "geo", geo.GeoView(geo.load_pincodes(config.PINCODE_TABLE),
+                                                            config.GEO_CELL_DEGREES))
+cache.register_view(config.REVIEW_SHEET, "ratings", RatingIndex())
+cache.register_view(config.REVIEW_SHEET, "by_vendor", ReviewIndex())
+cache.register_view(config.LEADS_SHEET, "leads", LeadIndex())
+for tab in (config.VENDOR_SHEET, config.REVIEW_SHEET, config.LEADS_SHEET, config.ADS_SHEET):
+    cache.register_view(tab, "columns", ColumnMap())
+
+
+def cache_metrics():
+    stats = cache.stats()
+    lines = []
+    for name, key, kind, help in (
+        ("helpo_cache_hits_total", "hits", "counter", "Snapshot reads served fresh."),
+        ("helpo_cache_stale_hits_total", "stale_hits", "counter", "Snapshot reads served past their TTL."),
+        ("helpo_cache_misses_total", "misses", "counter", "Snapshot reads that waited on a load."),
+        ("helpo_cache_errors_total", "errors", "counter", "Failed snapshot loads."),
+        ("helpo_cache_shared_loads_total", "shared", "counter", "Snapshots taken from another worker's load."),
+        ("helpo_cache_rows", "rows", "gauge", "Rows in the cached snapshot."),
+        ("helpo_cache_age_seconds", "age", "gauge", "Age of the cached snapshot."),
+    ):
+        lines.extend(metrics.family(name, help, kind, [
+            ({"tab": tab}, tab_stats[key]) for tab, tab_stats in stats.items() if tab_stats[key] is not None]))
+    pending = writes.stats()
+    lines.extend(metrics.family("helpo_write_queue_pending", "Rows journaled but not yet written to Sheets.",
+                                "gauge", [({"tab": tab}, s["pending"]) for tab, s in pending.items()]))
+    lines.extend(metrics.family("helpo_write_queue_oldest_age_seconds", "Age of the oldest journaled row.",
+                                "gauge", [({"tab": tab}, s["oldest_age"]) for tab, s in pending.items()]))
+    lines.extend(metrics.family("helpo_sheet_loads_total", "Tab loads by kind (full read or new rows only).",
+                                "counter", [({"kind": "full"}, delta.full_loads), ({"kind": "delta"}, delta.delta_loads)]))
+    for name, value in scheduler.stats().items():
+        kind = "gauge" if name == "pending_writes" else "counter"
+        metric = f"helpo_sheets_{name}" + ("_total" if kind == "counter" else "")
+        lines.extend(metrics.family(metric, f"Sheets scheduler {name.replace('_', ' ')}.", kind, [({}, value)]))
+    return lines
+
+
+metrics.collectors.append(cache_metrics)
+
+
+def get_records(tab_name):
+    """The cached records of `tab_name`, shared by every request; treat as read-only."""
+    return cache.records(tab_name)
+
+
+def prefetch(*tab_names):
+    """Load whichever of `tab_names` aren't cached in one batched read, before a page reads them one by one."""
+    cache.snapshots(*tab_names)
+
+
+def get_columns(tab_name):
+    """Header -> 1-based column number for `tab_name`, cached with its snapshot."""
+    columns = cache.view(tab_name, "columns")
+    if not columns:  # no data rows yet, so the snapshot can't tell us the headers
+        headers = backend.headers(tab_name)
+        columns = {header: col for col, header in enumerate(headers, start=1)}
+    return columns
+
+
+def update_row(tab_name, row_index, changes):
+    """Write the changed cells of sheet row `row_index` in one batched call.
+
+    Values equal to what the cached record already holds are skipped, and
+    unknown columns are reported and ignored. Returns the changes written.
+    """
+    columns = get_columns(tab_name)
+    snapshot = cache.snapshot(tab_name)
+    index = row_index - 2
+    current = snapshot.records[index] if 0 <= index < len(snapshot.records) else {}
+
+    written = {}
+    for col_name, value in changes.items():
+        if col_name not in columns:
+            print(f"⚠️ Column '{col_name}' not found in sheet.")
+            continue
+        if col_name in current and str(current[col_name]) == str(value):
+            continue
+        written[col_name] = value
+
+    if written:
+        backend.update_cells(tab_name, row_index, written, columns)
+        cache.update(tab_name, index, written)
+        if tab_name == config.VENDOR_SHEET:
+            fragments.invalidate(current.get("phone"))
+    return written
+
+
+def queue_row(tab_name, row):
+    """Append `row` to an append-only tab via the write-behind queue.
+
+    The cached snapshot is patched first so a refresh racing with the journal
+    write can't end up holding the row twice.
+    """
+    cache.append(tab_name, row)
+    try:
+        writes.enqueue(tab_name, row)
+    except Exception:
+        cache.invalidate(tab_name)
+        raise
+
+
+def find_vendor(phone=None, email=None):
+    """Return (sheet row, read-only record) for a vendor by phone or email, or (None, None)."""
+    lookup = cache.view(config.VENDOR_SHEET, "lookup")
+    return lookup.by_phone(phone) if phone is not None else lookup.by_email(email)
+
+
+def public_vendor(record):
+    """The vendor without its credentials, for pages anyone can see."""
+    return record.project([field for field in record if field not in PRIVATE_VENDOR_FIELDS])
+
+
+def get_ratings():
+    """Normalized vendor phone -> RatingAggregate; treat as read-only."""
+    return cache.view(config.REVIEW_SHEET, "ratings")
+
+
+def get_rating(phone):
+    return get_ratings().get(normalize_phone(phone), NO_RATINGS)
+
+
+def get_leads():
+    """LeadBook of callback requests by vendor phone; treat as read-only."""
+    return cache.view(config.LEADS_SHEET, "leads")
+
+
+def search_vendors(**params):
+    """Page of vendor listings; see search.query_vendors for the parameters."""
+    records = cache.snapshots(config.VENDOR_SHEET, config.REVIEW_SHEET)[0].records
+    if params.get("near") is not None:
+        params["geo"] = cache.view(config.VENDOR_SHEET, "geo")
+    # Near-me falls back to the ranked city listing when the geo index positions no one
+    params["ranking"] = cache.view(config.VENDOR_SHEET, "ranking")
+    return query_vendors(records, get_rating, **params)
+
+
+def suggest_vendors(query, city=""):
+    index = cache.view(config.VENDOR_SHEET, "suggestions")
+    return index.suggest(query, city, limit=config.SUGGESTION_LIMIT, min_similarity=config.SUGGESTION_MIN_SIMILARITY)
 
 def add_vendor(data):
-    sheet = connect_to_sheet("HelpoVendorSheet", "Helpovendor")
-    existing = sheet.get_all_records()
-    if any(str(v.get("phone")) == str(data["phone"]) for v in existing):
+    if find_vendor(phone=normalize_phone(data["phone"]))[0]:
         return "duplicate"
 
     row = [
@@ -38,22 +388,22 @@ def add_vendor(data):
     datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     ]
 
-    sheet.append_row(row)
+    backend.append_rows(config.VENDOR_SHEET, [row])
+    cache.append(config.VENDOR_SHEET, row)
     return "success"
 
 def get_reviews(phone):
-    sheet = connect_to_sheet("HelpoVendorSheet", "VendorReviews")
-    all_reviews = sheet.get_all_records()
-    return [r for r in all_reviews if str(r.get("VendorPhone", "")).strip() == phone]
+    """A vendor's reviews in sheet order; shared records, treat as read-only."""
+    return cache.view(config.REVIEW_SHEET, "by_vendor").get(normalize_phone(phone), [])
 
 def add_review(phone, name, rating, photo, comment):
-    sheet = connect_to_sheet("HelpoVendorSheet", "VendorReviews")  # or your review sheet name
-    sheet.append_row([
+    row = [
         phone,
         name,
         rating,
         photo,      # ✅ Add this new column
         comment,
         datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ])
-
+    ]
+    queue_row(config.REVIEW_SHEET, row)
+    fragments.invalidate(phone)
@@ -0,0 +1,30 @@
+"""gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master and forked into the workers, so the
+pincode table and templates are loaded once and shared copy-on-write, and
+the workers share loaded sheet snapshots through SHARED_SNAPSHOT_DIR: one
+worker reads a tab from Sheets and the others map the file it wrote.
+"""
+
+import os
+import tempfile
+
+# Must be set before the app (and config) is imported below
+if os.path.isdir("/dev/shm"):
+    os.environ.setdefault("SHARED_SNAPSHOT_DIR", "/dev/shm/helpo-snapshots")
+else:
+    os.environ.setdefault("SHARED_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "helpo-snapshots"))
+
+preload_app = True
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+
+def post_fork(server, worker):
+    # Each worker runs its own write-behind flusher, which also replays rows a
+    # previous run left in the journal
+    import google_sheets
+
+    google_sheets.writes.start()
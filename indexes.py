@@ -0,0 +1,304 @@
+"""Indexes derived from tab snapshots (see SnapshotCache.register_view).
+
+Each view builds its state once per snapshot and patches it when we append
+or update a row, so lookups stay O(1) without rescanning the tab. Requests
+read the state without locking, so a patch returns a new state that shares
+what it didn't change and leaves the one it was given as it was.
+"""
+
+from bisect import insort
+from datetime import datetime
+
+
+def normalize_phone(value):
+    return str(value if value is not None else "").strip()
+
+
+def normalize_email(value):
+    return str(value if value is not None else "").strip().lower()
+
+
+class VendorLookup:
+    """Normalized phone / lowercased email -> (sheet row, record)."""
+
+    __slots__ = ("phones", "emails")
+
+    def __init__(self):
+        self.phones = {}
+        self.emails = {}
+
+    def copy(self):
+        lookup = VendorLookup()
+        lookup.phones = dict(self.phones)
+        lookup.emails = dict(self.emails)
+        return lookup
+
+    def add(self, index, record):
+        entry = (index + 2, record)  # 1-based sheet rows, plus the header row
+        phone = normalize_phone(record.get("phone"))
+        email = normalize_email(record.get("email"))
+        # First row wins, like the next(...) scans this replaces
+        if phone:
+            self.phones.setdefault(phone, entry)
+        if email:
+            self.emails.setdefault(email, entry)
+
+    def discard(self, index, record):
+        phone = normalize_phone(record.get("phone"))
+        email = normalize_email(record.get("email"))
+        if self.phones.get(phone, (None,))[0] == index + 2:
+            del self.phones[phone]
+        if self.emails.get(email, (None,))[0] == index + 2:
+            del self.emails[email]
+
+    def by_phone(self, phone):
+        return self.phones.get(normalize_phone(phone), (None, None))
+
+    def by_email(self, email):
+        return self.emails.get(normalize_email(email), (None, None))
+
+
+class VendorIndex:
+    def build(self, records):
+        lookup = VendorLookup()
+        for i, record in enumerate(records):
+            lookup.add(i, record)
+        return lookup
+
+    def append(self, lookup, index, record):
+        lookup = lookup.copy()
+        lookup.add(index, record)
+        return lookup
+
+    def update(self, lookup, index, old, new):
+        lookup = lookup.copy()
+        lookup.discard(index, old)
+        lookup.add(index, new)
+        return lookup
+
+
+def parse_rating(value):
+    """A 1-5 star rating as int, or None for blanks and junk."""
+    try:
+        rating = int(value)
+    except (ValueError, TypeError):
+        return None
+    return rating if 1 <= rating <= 5 else None
+
+
+class RatingAggregate:
+    """Review count, rating sum and 1-5 histogram for one vendor."""
+
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0] * 6  # index 0 unused
+
+    def copy(self):
+        aggregate = RatingAggregate()
+        aggregate.count = self.count
+        aggregate.total = self.total
+        aggregate.histogram = list(self.histogram)
+        return aggregate
+
+    def add(self, rating):
+        self.count += 1
+        self.total += rating
+        self.histogram[rating] += 1
+
+    def remove(self, rating):
+        self.count -= 1
+        self.total -= rating
+        self.histogram[rating] -= 1
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 1) if self.count else None
+
+    def rating_counts(self):
+        return {star: self.histogram[star] for star in range(1, 6) if self.histogram[star]}
+
+
+NO_RATINGS = RatingAggregate()
+
+
+class RatingIndex:
+    """Normalized vendor phone -> RatingAggregate over the VendorReviews tab."""
+
+    def build(self, records):
+        ratings = {}
+        for record in records:
+            self._add(ratings, record)
+        return ratings
+
+    def _add(self, ratings, record, copy=False):
+        phone = normalize_phone(record.get("VendorPhone"))
+        rating = parse_rating(record.get("Rating"))
+        if phone and rating:
+            aggregate = ratings.get(phone)
+            if aggregate is None:
+                aggregate = ratings[phone] = RatingAggregate()
+            elif copy:
+                aggregate = ratings[phone] = aggregate.copy()
+            aggregate.add(rating)
+
+    def append(self, ratings, index, record):
+        ratings = dict(ratings)
+        self._add(ratings, record, copy=True)
+        return ratings
+
+    def update(self, ratings, index, old, new):
+        ratings = dict(ratings)
+        phone = normalize_phone(old.get("VendorPhone"))
+        rating = parse_rating(old.get("Rating"))
+        if phone in ratings and rating:
+            ratings[phone] = ratings[phone].copy()
+            ratings[phone].remove(rating)
+        self._add(ratings, new, copy=True)
+        return ratings
+
+
+LEAD_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_lead_time(value):
+    """Lead timestamp as a datetime; unreadable ones sort as newest, as they always have."""
+    try:
+        return datetime.strptime(str(value).strip(), LEAD_TIME_FORMAT)
+    except (ValueError, TypeError):
+        return datetime.max
+
+
+class LeadBook:
+    """Normalized vendor phone -> that vendor's leads in time order.
+
+    Each list holds (timestamp, row index, lead, lowercased name, phone text)
+    oldest first, so new leads append at the end and pages read it backwards.
+    Patches go to a `copy()`, whose lists are still the original's and get
+    replaced rather than changed.
+    """
+
+    __slots__ = ("vendors", "copied")
+
+    def __init__(self):
+        self.vendors = {}
+        self.copied = False  # lists are shared with the book this was copied from
+
+    def copy(self):
+        book = LeadBook()
+        book.vendors = dict(self.vendors)
+        book.copied = True
+        return book
+
+    def add(self, index, record, keep_sorted=True):
+        vendor = normalize_phone(record.get("vendor_phone"))
+        if not vendor:
+            return
+        # The ContactLeads headers carry trailing spaces
+        lead = {
+            "name": record.get("user_name"),
+            "phone": record.get("user_phone "),
+            "message": record.get("message "),
+            "timestamp": record.get("timestamp "),
+        }
+        entry = (parse_lead_time(lead["timestamp"]), index, lead, str(lead["name"]).lower(), str(lead["phone"]))
+        leads = self.vendors.get(vendor, [])
+        if self.copied:
+            leads = list(leads)
+        self.vendors[vendor] = leads
+        if keep_sorted and leads and entry < leads[-1]:
+            insort(leads, entry)
+        else:
+            leads.append(entry)
+
+    def discard(self, index, record):
+        vendor = normalize_phone(record.get("vendor_phone"))
+        leads = self.vendors.get(vendor, ())
+        for i, entry in enumerate(leads):
+            if entry[1] == index:
+                self.vendors[vendor] = leads[:i] + leads[i + 1:]
+                return
+
+    def count(self, phone):
+        return len(self.vendors.get(normalize_phone(phone), ()))
+
+    def page(self, phone, search="", offset=0, limit=None):
+        """(newest-first leads, total matching) for one vendor, optionally by name/phone substring."""
+        leads = self.vendors.get(normalize_phone(phone), [])
+        search = str(search or "").strip().lower()
+        if search:
+            matches = [entry[2] for entry in reversed(leads) if search in entry[3] or search in entry[4]]
+            end = None if limit is None else offset + limit
+            return matches[offset:end], len(matches)
+        # No filter: index straight into the sorted list
+        stop = len(leads) - offset
+        start = 0 if limit is None else max(0, stop - limit)
+        return [entry[2] for entry in reversed(leads[start:max(0, stop)])], len(leads)
+
+
+class LeadIndex:
+    """LeadBook over the ContactLeads tab."""
+
+    def build(self, records):
+        book = LeadBook()
+        for i, record in enumerate(records):
+            book.add(i, record, keep_sorted=False)
+        for leads in book.vendors.values():
+            leads.sort()
+        return book
+
+    def append(self, book, index, record):
+        book = book.copy()
+        book.add(index, record)
+        return book
+
+    def update(self, book, index, old, new):
+        book = book.copy()
+        book.discard(index, old)
+        book.add(index, new)
+        return book
+
+
+class ReviewIndex:
+    """Normalized vendor phone -> that vendor's review records, in sheet order."""
+
+    def build(self, records):
+        reviews = {}
+        for record in records:
+            phone = normalize_phone(record.get("VendorPhone"))
+            if phone:
+                reviews.setdefault(phone, []).append(record)
+        return reviews
+
+    def append(self, reviews, index, record):
+        phone = normalize_phone(record.get("VendorPhone"))
+        if not phone:
+            return reviews
+        return {**reviews, phone: reviews.get(phone, []) + [record]}
+
+    def update(self, reviews, index, old, new):
+        phone = normalize_phone(old.get("VendorPhone"))
+        vendor = reviews.get(phone, [])
+        for i, record in enumerate(vendor):
+            if record is old:
+                if normalize_phone(new.get("VendorPhone")) == phone:
+                    return {**reviews, phone: vendor[:i] + [new] + vendor[i + 1:]}  # keeps its place
+                reviews = {**reviews, phone: vendor[:i] + vendor[i + 1:]}
+                break
+        return self.append(reviews, index, new)
+
+
+class ColumnMap:
+    """Header -> 1-based column number, for writing cells by column name."""
+
+    def build(self, records):
+        headers = records[0].keys() if records else ()
+        return {header: col for col, header in enumerate(headers, start=1)}
+
+    def append(self, columns, index, record):
+        return columns
+
+    def update(self, columns, index, old, new):
+        return columns
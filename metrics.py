@@ -0,0 +1,209 @@
+"""Process-local request, Sheets and outbound-call metrics.
+
+Everything is rendered in the Prometheus text format by `render()` (served
+at /metrics). Counts are per process, so a scrape hits one gunicorn worker.
+`phase(name)` times a block and, inside a request, adds it to that request's
+Server-Timing breakdown.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, labels, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, [('le', '+Inf')])} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, labels)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {series[-1]:.6f}")
+        return lines
+
+
+http_requests = Histogram("helpo_http_request_duration_seconds", "Request latency by route.",
+                          ("route", "method", "status"))
+phases = Histogram("helpo_phase_duration_seconds", "Time spent in named request phases.", ("phase",))
+sheets_calls = Histogram("helpo_sheets_call_duration_seconds", "Google Sheets API calls by tab and operation.",
+                         ("tab", "op", "outcome"))
+sheets_bytes = Counter("helpo_sheets_bytes_total", "HTTP body bytes exchanged with the Sheets API.",
+                       ("tab", "op", "direction"))
+external_calls = Histogram("helpo_external_call_duration_seconds", "Outbound calls to OTP providers.",
+                           ("service", "op", "outcome"))
+
+METRICS = [http_requests, phases, sheets_calls, sheets_bytes, external_calls]
+
+# Callables returning extra exposition lines at scrape time (cache, write queue)
+collectors = []
+
+_current = threading.local()
+
+
+def _add_timing(name, seconds):
+    if has_request_context():
+        timings = g.setdefault("server_timing", {})
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        phases.observe(elapsed, name)
+        _add_timing(name, elapsed)
+
+
+@contextmanager
+def sheets_call(tab, op):
+    """Time one Sheets operation; HTTP bytes seen meanwhile on this thread are charged to it."""
+    previous = getattr(_current, "call", None)
+    _current.call = (tab, op)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        _current.call = previous
+        sheets_calls.observe(elapsed, tab, op, outcome)
+        _add_timing("sheets", elapsed)
+
+
+def record_http_bytes(response, *args, **kwargs):
+    """requests response hook for the Sheets session."""
+    tab, op = getattr(_current, "call", None) or ("", "other")
+    body = response.request.body
+    sheets_bytes.inc(tab, op, "sent", amount=len(body) if body else 0)
+    sheets_bytes.inc(tab, op, "received", amount=len(response.content))
+    return response
+
+
+@contextmanager
+def external_call(service, op):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        external_calls.observe(elapsed, service, op, outcome)
+        _add_timing(service, elapsed)
+
+
+def family(name, help, kind, samples):
+    """Exposition lines for a collector: samples are ({label: value}, number) pairs."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels.keys(), labels.values())} {value}")
+    return lines
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collect in collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(total):
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in g.get("server_timing", {}).items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def init_app(app, server_timing=False):
+    """Time every request and template render; optionally send a Server-Timing header."""
+    from flask import before_render_template, template_rendered
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.get("request_started")
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            http_requests.observe(elapsed, route, request.method, str(response.status_code))
+            if server_timing:
+                response.headers["Server-Timing"] = _server_timing(elapsed)
+        return response
+
+    def _render_started(sender, template, context, **extra):
+        g.setdefault("render_started", []).append(time.perf_counter())
+
+    def _render_finished(sender, template, context, **extra):
+        started = g.get("render_started")
+        if started:
+            elapsed = time.perf_counter() - started.pop()
+            if not started:  # templates rendered inside another one count as part of it
+                phases.observe(elapsed, "render")
+                _add_timing("render", elapsed)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
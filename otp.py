@@ -0,0 +1,234 @@
+"""OTP delivery: 2Factor SMS over a keep-alive session, email through a pooled SMTP queue.
+
+Nothing here blocks a request on a slow provider for longer than its timeout:
+2Factor calls share one pooled `requests.Session` with connect/read timeouts,
+and OTP emails are handed to background senders that reuse authenticated
+SMTP connections, reconnecting when the server has dropped them.
+"""
+
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+
+
+def _dropped(error):
+    """True if `error` means the SMTP connection is gone (not, say, a refused recipient)."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException subclasses OSError, so socket errors are the non-SMTP ones
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class TwoFactorClient:
+    def __init__(self, api_key, base_url, timeout=(3, 5), pool_size=10):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        # One keep-alive pool per process; sockets aren't shared across a fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def _get(self, op, path):
+        with metrics.external_call("2factor", op):
+            response = self.session().get(f"{self.base_url}/{self.api_key}/{path}", timeout=self.timeout)
+            return response.json()
+
+    def send(self, phone):
+        return self._get("send", f"SMS/{phone}/AUTOGEN")
+
+    def verify(self, session_id, otp):
+        return self._get("verify", f"SMS/VERIFY/{session_id}/{otp}")
+
+
+class SMTPPool:
+    """Up to `size` logged-in SMTP connections, reused across messages.
+
+    A connection idle for longer than `idle_check` seconds is probed with
+    NOOP before use, and one that turns out to be dropped mid-send is
+    replaced and the message retried once.
+    """
+
+    def __init__(self, host, port, username=None, password=None, size=2, timeout=10, starttls=True,
+                 idle_check=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.starttls = starttls
+        self.idle_check = idle_check
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []  # (connection, last used)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _connect(self):
+        with metrics.external_call("smtp", "connect"):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    server.starttls()
+                if self.username:
+                    server.login(self.username, self.password)
+            except Exception:
+                self._close(server)
+                raise
+        return server
+
+    def _close(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _checkout(self):
+        with self._lock:
+            if self._pid != os.getpid():  # forked: the parent's sockets aren't ours
+                self._idle, self._pid = [], os.getpid()
+            server, last_used = self._idle.pop() if self._idle else (None, 0)
+        if server is not None and time.monotonic() - last_used > self.idle_check:
+            try:
+                if server.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP failed")
+            except Exception:
+                server.close()
+                server = None
+        return server or self._connect()
+
+    def _checkin(self, server):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._idle.append((server, time.monotonic()))
+                return
+        server.close()
+
+    def _sendmail(self, server, sender, recipients, message):
+        with metrics.external_call("smtp", "send"):
+            server.sendmail(sender, recipients, message)
+
+    def send(self, sender, recipients, message):
+        with self._slots:
+            server = self._checkout()
+            try:
+                self._sendmail(server, sender, recipients, message)
+            except Exception as e:
+                if not _dropped(e):
+                    self._checkin(server)  # refused recipient and the like: the connection is fine
+                    raise
+                server.close()
+                server = self._connect()
+                try:
+                    self._sendmail(server, sender, recipients, message)
+                except Exception:
+                    server.close()
+                    raise
+            self._checkin(server)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+
+class MailQueue:
+    """Sends messages from `workers` background threads so requests return at once.
+
+    OTPs expire in minutes, so the queue lives in memory: a message is retried
+    `attempts` times and then dropped with a log line.
+    """
+
+    def __init__(self, pool, workers=2, maxsize=1000, attempts=3, retry_delay=2.0):
+        self.pool = pool
+        self.workers = workers
+        self.maxsize = maxsize
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Workers are per process; forked gunicorn workers start their own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.maxsize)
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"mail-sender-{i}", daemon=True).start()
+
+    def submit(self, sender, recipients, message):
+        """Queue a message; raises queue.Full when senders are hopelessly behind."""
+        self.start()
+        self._queue.put_nowait((sender, recipients, message))
+
+    def pending(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def _run(self):
+        jobs = self._queue
+        while True:
+            sender, recipients, message = jobs.get()
+            for attempt in range(1, self.attempts + 1):
+                try:
+                    self.pool.send(sender, recipients, message)
+                    break
+                except Exception as e:
+                    if attempt == self.attempts:
+                        print(f"Email to {', '.join(recipients)} failed after {attempt} attempts:", e)
+                    else:
+                        time.sleep(self.retry_delay * attempt)
+            jobs.task_done()
+
+
+two_factor = TwoFactorClient(
+    config.TWOFACTOR_API_KEY,
+    config.TWOFACTOR_BASE_URL,
+    timeout=(config.TWOFACTOR_CONNECT_TIMEOUT, config.TWOFACTOR_TIMEOUT),
+)
+
+smtp_pool = SMTPPool(
+    config.SMTP_HOST,
+    config.SMTP_PORT,
+    config.SENDER_EMAIL,
+    config.SENDER_PASSWORD,
+    size=config.SMTP_POOL_SIZE,
+    timeout=config.SMTP_TIMEOUT,
+    starttls=config.SMTP_STARTTLS,
+)
+
+mail = MailQueue(smtp_pool, workers=config.SMTP_POOL_SIZE)
+
+
+def send_email_otp(to_email, otp):
+    """Queue the OTP email and return without waiting for SMTP."""
+    msg = MIMEText(f"Your Helpo Services OTP is: {otp}")
+    msg["Subject"] = "Email OTP - Helpo Services"
+    msg["From"] = config.SENDER_EMAIL
+    msg["To"] = to_email
+    mail.submit(config.SENDER_EMAIL, [to_email], msg.as_string())
@@ -0,0 +1,226 @@
+"""Client-side scheduling for the Google Sheets API quotas.
+
+Every Sheets call goes through a `SheetsScheduler`: reads and writes draw
+from separate token buckets sized to our per-minute quota, identical reads
+already in flight are shared instead of repeated, and a 429 pauses the whole
+bucket (not just the caller) before a bounded, jittered retry.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+_context = threading.local()
+
+
+@contextmanager
+def background():
+    """Mark Sheets calls on this thread as background work no request waits on.
+
+    Background reads (refreshes) get the lowest priority and no retries;
+    background writes (the write-behind flusher) keep the long backoff.
+    """
+    previous = getattr(_context, "background", False)
+    _context.background = True
+    try:
+        yield
+    finally:
+        _context.background = previous
+
+
+def is_background():
+    return getattr(_context, "background", False)
+
+
+def is_quota_error(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def _retry_after(error):
+    try:
+        return float(error.response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """`rate` tokens per minute, holding at most `burst`.
+
+    Waiters are served lowest priority number first, FIFO within a priority.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate / 60.0
+        self.burst = burst or max(rate, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._tickets = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=0, reserve=0.0, deadline=None):
+        """Block until a token is ours; `reserve` tokens are left for higher priorities.
+
+        Returns False instead if none is by `deadline` (a time.monotonic() value).
+        """
+        if self.rate <= 0:
+            return True
+        ticket = (priority, next(self._tickets))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self.blocked_until - now
+                    if wait <= 0:
+                        if self._waiters[0] != ticket:
+                            wait = None  # woken when the head leaves
+                        elif self.tokens >= 1 + reserve:
+                            self.tokens -= 1
+                            return True
+                        else:
+                            wait = (1 + reserve - self.tokens) / self.rate
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def penalize(self, delay):
+        """Quota hit: empty the bucket and hold every caller for `delay` seconds."""
+        with self._cond:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            self.blocked_until = max(self.blocked_until, self.updated + delay)
+            self._cond.notify_all()
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SheetsScheduler:
+    """Rate limits, coalesces and retries Sheets calls.
+
+    `read(key, call)` runs `call` unless a read with the same key is already
+    in flight, in which case it waits for and returns that result. Background
+    reads (see `background()`) wait while writes are queued, leave
+    `background_reserve` of the read bucket to requests, and never retry: the
+    cache keeps serving the last snapshot instead. Calls made for a request
+    get `foreground_attempts` tries and `foreground_deadline` seconds in all,
+    token waits included, and then raise, so a quota error can't hold a
+    worker for minutes; background writes retry a 429 up to `attempts` times
+    with backoff up to `backoff_max`. Each retry waits for the bucket again,
+    so a quota error slows every caller down rather than multiplying calls.
+    """
+
+    def __init__(self, read_rate, write_rate, burst=None, attempts=5, backoff_base=1.0, backoff_max=32.0,
+                 background_reserve=0.25, foreground_attempts=2, foreground_deadline=10.0):
+        self.reads = TokenBucket(read_rate, burst)
+        self.writes = TokenBucket(write_rate, burst)
+        self.attempts = attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.foreground_attempts = foreground_attempts
+        self.foreground_deadline = foreground_deadline
+        self.background_reserve = background_reserve * self.reads.burst
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._pending_writes = 0
+        self._writes_idle = threading.Event()
+        self._writes_idle.set()
+        self._counts = {"coalesced": 0, "retries": 0, "quota_errors": 0, "timeouts": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def read(self, key, call):
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._counts["coalesced"] += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run(self.reads, call, background_read=is_background())
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def write(self, call):
+        with self._lock:
+            self._pending_writes += 1
+            self._writes_idle.clear()
+        try:
+            return self._run(self.writes, call)
+        finally:
+            with self._lock:
+                self._pending_writes -= 1
+                if not self._pending_writes:
+                    self._writes_idle.set()
+
+    def _run(self, bucket, call, background_read=False):
+        background = is_background()
+        attempts = 1 if background_read else self.attempts if background else self.foreground_attempts
+        deadline = None if background else time.monotonic() + self.foreground_deadline
+        attempt = 0
+        while True:
+            if background_read:
+                self._writes_idle.wait(self.backoff_max)
+                granted = bucket.acquire(priority=1, reserve=self.background_reserve)
+            else:
+                granted = bucket.acquire(priority=1 if background else 0, deadline=deadline)
+            if not granted:
+                self._count("timeouts")
+                raise TimeoutError(f"No Sheets quota within {self.foreground_deadline:g}s")
+            try:
+                return call()
+            except Exception as e:
+                if not is_quota_error(e):
+                    raise
+                attempt += 1
+                self._count("quota_errors")
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                bucket.penalize(delay + random.uniform(0, 0.1 * delay))
+                if attempt >= attempts or (deadline is not None and time.monotonic() + delay >= deadline):
+                    raise
+                self._count("retries")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, pending_writes=self._pending_writes)
@@ -0,0 +1,163 @@
+"""Precomputed vendor ranking for listings.
+
+Vendors are ordered by subscription tier first (Premium, then Standard, then
+Basic, then free), then by a score mixing their rating, review volume and
+how recently they joined. `RankingView` builds the ordering once per vendor
+snapshot as one overall list plus one list per category and per city, and
+keeps them sorted through our own appends and updates, so a listing reads a
+slice instead of sorting the catalogue.
+
+Ratings are the review aggregates current when the ordering is built; a
+new review moves a vendor at the next vendor refresh.
+"""
+
+import math
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from heapq import merge
+
+from indexes import NO_RATINGS, normalize_phone
+
+# subscription column value (lowercased) -> tier; anything else is free
+TIERS = {"premium": 3, "standard": 2, "basic": 1, "subscribed": 1}
+
+# Bayesian prior: a vendor starts as if it had PRIOR_COUNT reviews of PRIOR_MEAN stars
+PRIOR_COUNT = 5
+PRIOR_MEAN = 3.5
+# Review count at which the volume term saturates, and the recency half-life in days
+VOLUME_CAP = 100
+RECENCY_HALF_LIFE_DAYS = 60
+WEIGHTS = {"rating": 0.6, "volume": 0.25, "recency": 0.15}
+
+
+def _text(value):
+    return str(value if value is not None else "").strip().lower()
+
+
+def tier(record):
+    return TIERS.get(_text(record.get("subscription")), 0)
+
+
+def score(record, rating, now=None):
+    """0..1 quality score within a tier."""
+    now = time.time() if now is None else now
+    bayes = (PRIOR_COUNT * PRIOR_MEAN + rating.total) / (PRIOR_COUNT + rating.count)
+    volume = min(1.0, math.log1p(rating.count) / math.log1p(VOLUME_CAP))
+    try:
+        created = datetime.strptime(str(record.get("created_at", "")), "%Y-%m-%d %H:%M:%S").timestamp()
+        age_days = max(0.0, (now - created) / 86400)
+        recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    except ValueError:
+        recency = 0.0
+    return WEIGHTS["rating"] * bayes / 5 + WEIGHTS["volume"] * volume + WEIGHTS["recency"] * recency
+
+
+class Ranking:
+    """Sorted (key, vendor index) lists: `all`, and per normalized category and city.
+
+    Listings read a ranking (and iterate its lists lazily) without locking,
+    so a published one never changes: patches go to a `copy()`, whose
+    category and city lists are still the original's and get replaced
+    rather than changed.
+    """
+
+    __slots__ = ("keys", "all", "categories", "cities", "ratings", "now", "copied")
+
+    def __init__(self, ratings, now=None):
+        self.ratings = ratings  # normalized phone -> RatingAggregate
+        self.now = time.time() if now is None else now
+        self.keys = {}  # vendor index -> (key, category, city)
+        self.all = []
+        self.categories = {}
+        self.cities = {}
+        self.copied = False  # category and city lists are shared with the ranking this was copied from
+
+    def copy(self):
+        ranking = Ranking(self.ratings, self.now)
+        ranking.keys = dict(self.keys)
+        ranking.all = list(self.all)
+        ranking.categories = dict(self.categories)
+        ranking.cities = dict(self.cities)
+        ranking.copied = True
+        return ranking
+
+    def _list(self, lists, name):
+        # The ranked list `name` in `lists`, ready to change
+        ranked = lists.get(name)
+        if ranked is None:
+            ranked = lists[name] = []
+        elif self.copied:
+            ranked = lists[name] = list(ranked)
+        return ranked
+
+    def key(self, index, record):
+        # Ascending sort puts the highest tier and score first; the index keeps ties in sheet order
+        rating = self.ratings.get(normalize_phone(record.get("phone")), NO_RATINGS)
+        return (-tier(record), -score(record, rating, self.now), index)
+
+    def add(self, index, record, keep_sorted=True):
+        entry = self.key(index, record)
+        category, city = _text(record.get("category")), _text(record.get("city"))
+        self.keys[index] = (entry, category, city)
+        for ranked in (self.all, self._list(self.categories, category), self._list(self.cities, city)):
+            if keep_sorted:
+                insort(ranked, entry)
+            else:
+                ranked.append(entry)
+
+    def discard(self, index):
+        entry, category, city = self.keys.pop(index, (None, None, None))
+        if entry is None:
+            return
+        for ranked in (self.all, self._list(self.categories, category), self._list(self.cities, city)):
+            i = bisect_left(ranked, entry)
+            if i < len(ranked) and ranked[i] == entry:
+                del ranked[i]
+
+    def sort(self):
+        for ranked in [self.all, *self.categories.values(), *self.cities.values()]:
+            ranked.sort()
+
+    def ranked(self, category="", city=""):
+        """(key, vendor index) entries best first, for an exact category and a city substring.
+
+        Returns a list (safe to slice and count) when one precomputed list
+        answers the filters, else an iterator.
+        """
+        if category:
+            ranked = self.categories.get(category, [])
+            return (entry for entry in ranked if city in self.keys[entry[2]][2]) if city else ranked
+        if city:
+            lists = [ranked for name, ranked in self.cities.items() if city in name]
+            return lists[0] if len(lists) == 1 else merge(*lists)
+        return self.all
+
+
+class RankingView:
+    """SnapshotCache view over the vendor tab; `ratings()` returns the current rating map.
+
+    The map is fetched once per build: appends and updates are applied under
+    the cache lock and must not read through the cache again.
+    """
+
+    def __init__(self, ratings):
+        self.ratings = ratings
+
+    def build(self, records):
+        ranking = Ranking(self.ratings())
+        for i, record in enumerate(records):
+            ranking.add(i, record, keep_sorted=False)
+        ranking.sort()
+        return ranking
+
+    def append(self, ranking, index, record):
+        ranking = ranking.copy()
+        ranking.add(index, record)
+        return ranking
+
+    def update(self, ranking, index, old, new):
+        ranking = ranking.copy()
+        ranking.discard(index)
+        ranking.add(index, new)
+        return ranking
@@ -0,0 +1,106 @@
+"""Compact, read-only sheet records.
+
+`get_all_records()` gives every row its own dict holding every header again.
+A `Record` is a values tuple plus a `Columns` header map shared by all rows
+with the same headers, so a 20-column vendor row costs one small object and
+one tuple. Records behave like read-only dicts (`get`, `[]`, `in`, `keys`,
+`dict(record)`, attribute access in templates), so the snapshot can be handed
+to every request as is; `replace` and `project` build new records instead of
+copying dicts.
+"""
+
+from collections.abc import Mapping
+
+from gspread.utils import numericise_all
+
+
+class Columns:
+    """Header names in sheet order and their positions."""
+
+    __slots__ = ("headers", "positions")
+
+    _shared = {}
+
+    def __init__(self, headers):
+        self.headers = tuple(headers)
+        # A repeated header resolves to its last column, as dict(zip(headers, row)) did
+        self.positions = {header: i for i, header in enumerate(self.headers)}
+
+    def __reduce__(self):
+        # Unpickled records join the process-wide instance for their headers
+        return Columns.of, (self.headers,)
+
+    @classmethod
+    def of(cls, headers):
+        """The one Columns instance for these headers (a tab's rows all share it)."""
+        headers = tuple(headers)
+        columns = cls._shared.get(headers)
+        if columns is None:
+            columns = cls._shared.setdefault(headers, cls(headers))
+        return columns
+
+
+class Record(Mapping):
+    __slots__ = ("columns", "values")
+
+    def __init__(self, columns, values):
+        self.columns = columns
+        self.values = values
+
+    @classmethod
+    def from_row(cls, columns, row):
+        """Parse raw cell strings like get_all_records(): padded to the headers, numbers as numbers."""
+        width = len(columns.headers)
+        row = list(row[:width]) + [""] * (width - len(row))
+        return cls(columns, tuple(numericise_all(row)))
+
+    def __getitem__(self, key):
+        i = self.columns.positions.get(key)
+        if i is None:
+            raise KeyError(key)
+        return self.values[i]
+
+    def get(self, key, default=None):
+        i = self.columns.positions.get(key)
+        return default if i is None else self.values[i]
+
+    def __contains__(self, key):
+        return key in self.columns.positions
+
+    def __iter__(self):
+        return iter(self.columns.positions)
+
+    def __len__(self):
+        return len(self.columns.positions)
+
+    def __eq__(self, other):
+        if isinstance(other, Record) and other.columns is self.columns:
+            return self.values == other.values
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Record({dict(self)!r})"
+
+    def replace(self, changes):
+        """A copy with `changes` ({header: value}) applied; unknown headers are ignored."""
+        values = list(self.values)
+        for key, value in changes.items():
+            i = self.columns.positions.get(key)
+            if i is not None:
+                values[i] = value
+        return Record(self.columns, tuple(values))
+
+    def project(self, fields):
+        """A record holding only `fields` (those this one has), e.g. a vendor without its password."""
+        fields = [field for field in fields if field in self.columns.positions]
+        return Record(Columns.of(fields), tuple(self[field] for field in fields))
+
+
+def parse_records(values):
+    """Records for raw [headers] + rows values, parsed as get_all_records() would."""
+    if not values:
+        return []
+    columns = Columns.of(values[0])
+    return [Record.from_row(columns, row) for row in values[1:]]
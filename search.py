@@ -0,0 +1,300 @@
+"""Search structures built from the vendor snapshot."""
+
+import base64
+import math
+import re
+from bisect import bisect_left, insort
+
+SUGGESTION_FIELDS = ("business_name", "category", "city", "description")
+# Prefix hits outrank every fuzzy score (at most 2.0)
+PREFIX_FIELDS = {"business_name": 3.0, "category": 2.5}
+
+_WORD = re.compile(r"\w+")
+
+
+def _text(value):
+    return str(value if value is not None else "").strip().lower()
+
+
+def trigrams(text, partial=False):
+    """Word-padded trigrams, so two-letter queries still hit word starts.
+
+    With `partial`, the last word is treated as an unfinished prefix (as typed
+    into the autocomplete) and gets no end padding.
+    """
+    grams = set()
+    words = _WORD.findall(text)
+    for i, word in enumerate(words):
+        padded = f"  {word}" if partial and i == len(words) - 1 else f"  {word} "
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+class SuggestionIndex:
+    """Prefix and trigram index over the vendor fields the autocomplete searches.
+
+    Matching runs over distinct (field, value) pairs rather than vendors, so a
+    category shared by thousands of vendors is scored once. `words` is a
+    sorted list of (word, value id, weight) for business names and
+    categories; `grams` maps a trigram to the value ids containing it; and
+    `vendors[value id]` lists the vendor indexes holding that value.
+
+    Requests read an index without locking, so a published one never
+    changes: patches go to a `copy()`, whose inner sets and dicts are still
+    the original's and get replaced rather than changed.
+    """
+
+    __slots__ = ("value_ids", "texts", "vendors", "words", "grams", "names", "cities", "vendor_values", "copied")
+
+    def __init__(self):
+        self.value_ids = {}
+        self.texts = []
+        self.vendors = []
+        self.words = []
+        self.grams = {}
+        self.names = []
+        self.cities = []
+        self.vendor_values = []
+        self.copied = False  # inner containers are shared with the index this was copied from
+
+    def copy(self):
+        index = SuggestionIndex()
+        index.value_ids = dict(self.value_ids)
+        index.texts = list(self.texts)
+        index.vendors = list(self.vendors)
+        index.words = list(self.words)
+        index.grams = dict(self.grams)
+        index.names = list(self.names)
+        index.cities = list(self.cities)
+        index.vendor_values = list(self.vendor_values)
+        index.copied = True
+        return index
+
+    def _value_vendors(self, value_id):
+        # The vendors dict of one value, ready to change
+        vendors = self.vendors[value_id]
+        if self.copied:
+            vendors = self.vendors[value_id] = dict(vendors)
+        return vendors
+
+    def _value_id(self, field, text, keep_sorted):
+        key = (field, text)
+        value_id = self.value_ids.get(key)
+        if value_id is None:
+            value_id = self.value_ids[key] = len(self.texts)
+            self.texts.append(text)
+            self.vendors.append({})
+            weight = PREFIX_FIELDS.get(field)
+            if weight:
+                for word in set(_WORD.findall(text)):
+                    if keep_sorted:
+                        insort(self.words, (word, value_id, weight))
+                    else:
+                        self.words.append((word, value_id, weight))
+            for gram in trigrams(text):
+                postings = self.grams.get(gram)
+                if postings is None:
+                    self.grams[gram] = {value_id}
+                elif self.copied:
+                    self.grams[gram] = postings | {value_id}
+                else:
+                    postings.add(value_id)
+        return value_id
+
+    def add(self, index, record, keep_sorted=True):
+        while len(self.names) <= index:
+            self.names.append(None)
+            self.cities.append("")
+            self.vendor_values.append(())
+        value_ids = []
+        for field in SUGGESTION_FIELDS:
+            text = _text(record.get(field))
+            if text:
+                value_id = self._value_id(field, text, keep_sorted)
+                self._value_vendors(value_id)[index] = None
+                value_ids.append(value_id)
+        self.names[index] = record.get("business_name")
+        self.cities[index] = _text(record.get("city"))
+        self.vendor_values[index] = tuple(value_ids)
+
+    def discard(self, index):
+        for value_id in self.vendor_values[index]:
+            self._value_vendors(value_id).pop(index, None)
+        self.names[index] = None
+        self.vendor_values[index] = ()
+
+    def suggest(self, query, city="", limit=10, min_similarity=0.5):
+        query = _text(query)
+        city = _text(city)
+        if not query:
+            return []
+
+        scores = {}
+
+        # Word-prefix matches on business name and category values
+        words = self.words
+        i = bisect_left(words, (query,))
+        while i < len(words) and words[i][0].startswith(query):
+            _, value_id, weight = words[i]
+            i += 1
+            if weight > scores.get(value_id, 0.0):
+                scores[value_id] = weight
+
+        # Fuzzy matches: share of the query's trigrams found in a value.
+        # A match needs `needed` of them, so it must contain at least one of
+        # the rarest len - needed + 1 grams; only those postings are scanned.
+        query_grams = sorted(trigrams(query, partial=True), key=lambda g: len(self.grams.get(g, ())))
+        if len(query) >= 3 and query_grams:
+            needed = max(1, math.ceil(min_similarity * len(query_grams)))
+            postings = [self.grams.get(gram, ()) for gram in query_grams]
+            candidates = set()
+            for posting in postings[:len(query_grams) - needed + 1]:
+                candidates.update(posting)
+            for value_id in candidates:
+                if value_id in scores:
+                    continue
+                similarity = sum(1 for posting in postings if value_id in posting) / len(query_grams)
+                if similarity < min_similarity:
+                    continue
+                if query in self.texts[value_id]:
+                    similarity += 1.0
+                scores[value_id] = similarity
+
+        # Expand the best values to vendors until `limit` names are found
+        suggestions = {}
+        for value_id in sorted(scores, key=lambda v: (-scores[v], self.texts[v])):
+            for index in self.vendors[value_id]:
+                name = self.names[index]
+                if not name or name in suggestions or (city and city not in self.cities[index]):
+                    continue
+                suggestions[name] = None
+                if len(suggestions) >= limit:
+                    return list(suggestions)
+        return list(suggestions)
+
+
+class SuggestionView:
+    def build(self, records):
+        index = SuggestionIndex()
+        for i, record in enumerate(records):
+            index.add(i, record, keep_sorted=False)
+        index.words.sort()
+        return index
+
+    def append(self, index, position, record):
+        index = index.copy()
+        index.add(position, record)
+        return index
+
+    def update(self, index, position, old, new):
+        index = index.copy()
+        index.discard(position)
+        index.add(position, new)
+        return index
+
+
+# Columns a public listing may expose; never email, password or timestamps we don't render
+LISTING_FIELDS = (
+    "business_name", "category", "phone", "photos", "service_hours", "description",
+    "plot_info", "building_info", "street", "landmark", "area", "city", "state", "pincode",
+    "subscription", "created_at",
+)
+
+# sort name -> (key over a (record, rating, km) match, reverse)
+SORTS = {
+    "rating": (lambda m: (m[1].average or 0, m[1].count), True),
+    "reviews": (lambda m: (m[1].count, m[1].average or 0), True),
+    "name": (lambda m: _text(m[0].get("business_name")), False),
+    "newest": (lambda m: str(m[0].get("created_at", "")), True),
+}
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(f"o:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Offset encoded in `cursor`; anything unreadable starts from the top."""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, offset = raw.split(":", 1)
+        return max(0, int(offset)) if prefix == "o" else 0
+    except (ValueError, UnicodeDecodeError):
+        return 0
+
+
+def listing(record, rating, km=None):
+    """Project a vendor record to the public listing fields plus its rating (and distance)."""
+    item = {field: record.get(field, "") for field in LISTING_FIELDS}
+    item["average_rating"] = rating.average
+    item["review_count"] = rating.count
+    if km is not None:
+        item["distance_km"] = round(km, 1)
+    return item
+
+
+def query_vendors(records, rating_for, query="", category="", city="", sort="", min_rating=None,
+                  limit=20, cursor=None, near=None, radius_km=None, geo=None, ranking=None):
+    """Filter, sort and page vendor records for / and /api/vendors.
+
+    `records` is the shared snapshot and is never modified; results are
+    listing projections. With `near` (lat, lon) and a `geo` index that
+    positions any vendor, only vendors with a known position (within
+    `radius_km`, if given) match, `city` is ignored, and they come nearest
+    first unless `sort` says otherwise; the index is then read only until
+    the page is full, and total is None when it wasn't read to the end.
+    Otherwise (including near-me without a pincode table) vendors come in
+    the precomputed `ranking` order, filters included; a `sort` reorders
+    them but keeps that order among vendors it ranks equal. Returns (page,
+    next_cursor, total matches).
+    """
+    query = _text(query)
+    category = _text(category)
+    city = _text(city)
+    offset = decode_cursor(cursor)
+    stop = None
+
+    if near is not None and geo is not None and geo.points:
+        city = ""  # distance takes the place of the city name
+        candidates = ((records[index], km) for index, km in geo.nearest(near[0], near[1], radius_km))
+        # Nearest-first needs no sort, so stop one past the page to know if there's more
+        stop = None if sort in SORTS else offset + limit + 1
+    elif ranking is not None:
+        ranked = ranking.ranked(category, city)
+        if isinstance(ranked, list) and not query and min_rating is None and sort not in SORTS:
+            # A precomputed list is exactly the answer: the page is a slice
+            page = [listing(records[index], rating_for(records[index].get("phone")))
+                    for _, _, index in ranked[offset:offset + limit]]
+            next_cursor = encode_cursor(offset + limit) if offset + limit < len(ranked) else None
+            return page, next_cursor, len(ranked)
+        candidates = ((records[index], None) for _, _, index in ranked)
+    else:
+        candidates = ((record, None) for record in records)
+
+    matches = []
+    exhausted = True
+    for record, km in candidates:
+        if query and query not in _text(record.get("business_name")) and query not in _text(record.get("category")):
+            continue
+        if category and _text(record.get("category")) != category:
+            continue
+        if city and city not in _text(record.get("city")):
+            continue
+        rating = rating_for(record.get("phone"))
+        if min_rating is not None and rating.average is not None and rating.average < min_rating:
+            continue
+        matches.append((record, rating, km))
+        if stop is not None and len(matches) >= stop:
+            exhausted = False
+            break
+
+    if sort in SORTS:
+        key, reverse = SORTS[sort]
+        matches.sort(key=key, reverse=reverse)
+
+    page = [listing(record, rating, km) for record, rating, km in matches[offset:offset + limit]]
+
+    next_cursor = encode_cursor(offset + limit) if offset + limit < len(matches) else None
+    return page, next_cursor, len(matches) if exhausted else None
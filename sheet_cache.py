@@ -0,0 +1,523 @@
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from gspread.utils import numericise_all
+
+from records import Columns, Record
+
+
+class TabSnapshot:
+    """An immutable list of one tab's records, replaced (never mutated) on change.
+
+    Requests share it as is: records are read-only, changes build new ones,
+    and a view state, once built, is only ever replaced by a patched copy.
+    """
+
+    __slots__ = ("tab", "records", "headers", "version", "tag", "loaded_at", "expires_at", "views")
+
+    def __init__(self, tab, records, version, tag, loaded_at, expires_at):
+        self.tab = tab
+        self.records = records
+        self.headers = list(records[0].keys()) if records else None
+        self.version = version
+        self.tag = tag  # names this exact data; the same in every worker that shares it
+        self.loaded_at = loaded_at
+        self.expires_at = expires_at
+        self.views = {}
+
+    def age(self):
+        return time.time() - self.loaded_at
+
+
+class _Flight:
+    """One in-progress load that concurrent callers wait on."""
+
+    __slots__ = ("event", "snapshot", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.snapshot = None
+        self.error = None
+
+
+class SnapshotCache:
+    """Read-through, per-tab cache of get_all_records() results.
+
+    Our own writes patch the cached snapshot in place of a refetch; anything
+    the cache can't patch (unknown headers, row out of range) invalidates it.
+    Writes made while a load is in flight are replayed on what it loaded.
+
+    Views registered with `register_view` are indexes derived from a tab's
+    records. They are built lazily once per snapshot and carried forward
+    through our own appends and updates when the view knows how to patch
+    itself (`append(state, index, record)` / `update(state, index, old, new)`);
+    otherwise they are rebuilt on next use. Requests read view state without
+    the lock, so a patch must return new state and leave the state it was
+    given unchanged.
+
+    Past its TTL a snapshot is still served for up to `max_stale` seconds
+    while a single background load replaces it; beyond that, reads block on
+    the reload and raise if it fails. A refresher thread reloads every tab
+    that has been read on `refresh_interval`, so requests rarely see a
+    stale snapshot at all. Loads no request waits on run inside the
+    `background()` context manager, so the Sheets scheduler can rank them
+    below request traffic.
+
+    For `append_only` tabs a load that only adds rows to the current snapshot
+    keeps its views and appends the new rows to them instead of rebuilding.
+
+    `snapshots(*tabs)` loads every tab a caller would block on together: in
+    one `batch_loader(tabs)` call ({tab: records}) if there is one, else on up
+    to `max_parallel` threads, so a page needing three cold tabs waits for
+    one round trip rather than three.
+
+    With a `store` (snapshot_store.SnapshotStore) the worker processes on a
+    host share loads: a load first takes a recent enough snapshot another
+    worker published, and otherwise takes the store's lock for the tab,
+    loads it and publishes it with its views (except those marked
+    `shared = False`) for the others. A worker never takes a published
+    snapshot loaded before its own last write to that tab.
+    """
+
+    def __init__(self, loader, ttl=60, ttls=None, max_stale=600, max_stales=None, refresh_interval=None,
+                 background=None, append_only=(), batch_loader=None, max_parallel=4, store=None):
+        self.loader = loader
+        self.store = store
+        self.batch_loader = batch_loader
+        self.max_parallel = max_parallel
+        self._pool = None
+        self._pool_pid = None
+        self.append_only = set(append_only)
+        self.background = background or nullcontext  # wraps loads no request is waiting on
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.max_stale = max_stale
+        self.max_stales = max_stales or {}
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._versions = {}
+        self._writes = {}
+        self._patches = {}  # tab -> [(write number, patch)] made while a load of it is in flight
+        self._inflight = {}
+        self._hits = {}
+        self._stale_hits = {}
+        self._misses = {}
+        self._errors = {}
+        self._shared = {}
+        self._written_at = {}
+        self._refresher = None
+        self._refresher_pid = None
+        self._stop = threading.Event()
+        self._views = {}
+        # Versions are counted per process; the instance id keeps local tags distinct across workers and restarts
+        self.instance = uuid.uuid4().hex[:12]
+
+    def _ttl(self, tab):
+        return self.ttls.get(tab, self.ttl)
+
+    def _max_stale(self, tab):
+        return self.max_stales.get(tab, self.max_stale)
+
+    def _store(self, tab, records, expires_at, loaded_at=None, tag=None):
+        # Caller holds the lock
+        version = self._versions.get(tab, 0) + 1
+        self._versions[tab] = version
+        loaded_at = time.time() if loaded_at is None else loaded_at
+        snapshot = TabSnapshot(tab, records, version, tag or f"{self.instance}.{version}", loaded_at, expires_at)
+        self._snapshots[tab] = snapshot
+        return snapshot
+
+    def snapshot(self, tab):
+        self._ensure_refresher()
+        with self._lock:
+            snapshot = self._snapshots.get(tab)
+            if snapshot is not None and time.time() < snapshot.expires_at:
+                self._hits[tab] = self._hits.get(tab, 0) + 1
+                return snapshot
+            if snapshot is not None and snapshot.age() < self._max_stale(tab):
+                self._stale_hits[tab] = self._stale_hits.get(tab, 0) + 1
+                if tab not in self._inflight:
+                    flight, writes_before = self._begin_flight(tab)
+                    threading.Thread(target=self._quiet_fetch, args=(tab, flight, writes_before), daemon=True).start()
+                return snapshot
+            self._misses[tab] = self._misses.get(tab, 0) + 1
+        return self._load(tab)
+
+    def snapshots(self, *tabs):
+        """Snapshots of `tabs`, in order, loading the ones that must be waited on together."""
+        self._ensure_refresher()
+        with self._lock:
+            cold = [tab for tab in dict.fromkeys(tabs) if not self._servable(tab)]
+        if len(cold) > 1:
+            self._load_many(cold)
+        return [self.snapshot(tab) for tab in tabs]
+
+    def _servable(self, tab):
+        # Caller holds the lock; True if snapshot() would answer without waiting on a load
+        snapshot = self._snapshots.get(tab)
+        return snapshot is not None and snapshot.age() < self._max_stale(tab)
+
+    def _load_many(self, tabs):
+        led, flights = {}, []
+        with self._lock:
+            for tab in tabs:
+                flight = self._inflight.get(tab)
+                if flight is None:
+                    self._misses[tab] = self._misses.get(tab, 0) + 1
+                    flight, writes_before = led[tab] = self._begin_flight(tab)
+                flights.append(flight)
+
+        try:
+            with self.store.lock(*led) if self.store is not None and led else nullcontext():
+                if self.store is not None:
+                    for tab in list(led):
+                        snapshot = self._adopt(tab)
+                        if snapshot is not None:
+                            self._finish(tab, led.pop(tab)[0], snapshot)
+                locked = self.store is not None
+                if len(led) > 1 and self.batch_loader is not None:
+                    try:
+                        results = self.batch_loader(list(led))
+                    except Exception as e:
+                        results = e
+                    for tab, (flight, writes_before) in led.items():
+                        self._try_fetch(tab, flight, writes_before, lambda tab: self._result(results, tab), locked)
+                elif len(led) > 1:
+                    list(self._executor().map(lambda item: self._try_fetch(item[0], *item[1], None, locked),
+                                              led.items()))
+                else:
+                    for tab, (flight, writes_before) in led.items():
+                        self._try_fetch(tab, flight, writes_before, None, locked)
+                # Published only once every tab is in, since building a view may read the others
+                if self.store is not None:
+                    for tab, (flight, _) in led.items():
+                        if flight.snapshot is not None:
+                            self._publish(flight.snapshot)
+        except Exception as e:  # the store's lock itself failed
+            for tab, (flight, _) in led.items():
+                self._finish(tab, flight, error=e)
+
+        for flight in flights:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+
+    @staticmethod
+    def _result(results, tab):
+        if isinstance(results, Exception):
+            raise results
+        return results[tab]
+
+    def _try_fetch(self, tab, flight, writes_before, load=None, locked=False):
+        try:
+            self._fetch(tab, flight, writes_before, load, locked)
+        except Exception:
+            pass  # kept on the flight for every waiter
+
+    def _executor(self):
+        # Threads don't survive a fork, so each worker process gets its own pool
+        with self._lock:
+            if self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(self.max_parallel, thread_name_prefix="sheet-load")
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _begin_flight(self, tab):
+        # Caller holds the lock
+        flight = self._inflight[tab] = _Flight()
+        return flight, self._writes.get(tab, 0)
+
+    def _finish(self, tab, flight, snapshot=None, error=None):
+        if flight.event.is_set():
+            return
+        with self._lock:
+            if error is not None:
+                self._errors[tab] = self._errors.get(tab, 0) + 1
+            self._inflight.pop(tab, None)
+            self._patches.pop(tab, None)
+        flight.snapshot, flight.error = snapshot, error
+        flight.event.set()
+
+    def _load(self, tab):
+        """Fetch `tab` once no matter how many threads ask for it at the same time."""
+        with self._lock:
+            flight = self._inflight.get(tab)
+            leader = flight is None
+            if leader:
+                flight, writes_before = self._begin_flight(tab)
+        if leader:
+            return self._fetch(tab, flight, writes_before)
+
+        flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.snapshot
+
+    def _fetch(self, tab, flight, writes_before, load=None, locked=False):
+        """Load `tab` for `flight`: from the store if another worker just did, else through the loader.
+
+        `locked` means the caller holds the store's lock and publishes itself.
+        """
+        shared = self.store is not None and not locked
+        try:
+            snapshot = self._adopt(tab) if shared else None
+            if snapshot is None:
+                with self.store.lock(tab) if shared else nullcontext():
+                    # Whoever held the lock before us may have just published it
+                    snapshot = self._adopt(tab) if shared else None
+                    if snapshot is None:
+                        started = time.time()
+                        snapshot = self._install(tab, (load or self.loader)(tab), writes_before, started)
+                        self._finish(tab, flight, snapshot)
+                        if shared:
+                            snapshot = self._publish(snapshot)
+            self._finish(tab, flight, snapshot)
+            return snapshot
+        except Exception as e:
+            self._finish(tab, flight, error=e)
+            raise
+
+    def _install(self, tab, records, writes_before, loaded_at):
+        with self._lock:
+            now = time.time()
+            old = self._snapshots.get(tab)
+            # Our writes that landed while we were fetching may be missing from `records`
+            patches = [patch for number, patch in self._patches.get(tab, ()) if number > writes_before]
+            if any(patch[0] == "invalidate" for patch in patches):
+                # No telling what changed: these go to whoever waited on this
+                # load, but aren't kept, so the next read loads again.
+                return TabSnapshot(tab, records, self._versions.get(tab, 0), uuid.uuid4().hex, loaded_at, now)
+            snapshot = self._store(tab, records, now + self._ttl(tab), loaded_at)
+            if old is not None and tab in self.append_only and self._extends(old.records, records):
+                self._carry_appends(old, snapshot)
+            if patches:
+                snapshot = self._replay(snapshot, patches)
+        return snapshot
+
+    def _replay(self, snapshot, patches):
+        # Caller holds the lock. Updates set the values we wrote again; appends
+        # are skipped when the load already returned the row, which is then at
+        # or past where our snapshot had put it.
+        starts = [patch[2] for patch in patches if patch[0] == "append"]
+        loaded = Counter(record.values for record in snapshot.records[min(starts, default=0):])
+        for patch in patches:
+            if patch[0] == "append" and snapshot.headers:
+                values = Record.from_row(Columns.of(snapshot.headers), patch[1]).values
+                if loaded[values]:
+                    loaded[values] -= 1
+                    continue
+            new = self._patch(snapshot, patch)
+            if new is None:
+                self._snapshots.pop(snapshot.tab, None)  # can't be patched in; load again on the next read
+                return snapshot
+            snapshot = new
+        return snapshot
+
+    def _adopt(self, tab):
+        """Install the snapshot of `tab` another worker published, if it's recent and has our writes."""
+        header = self.store.peek(tab)
+        if header is None:
+            return None
+        tag, loaded_at = header
+        # Fresh enough that the refresher wouldn't reload it yet, and loaded after our last write here
+        max_age = min(self.refresh_interval or self._ttl(tab), self._ttl(tab))
+        if time.time() - loaded_at >= max_age or loaded_at <= self._written_at.get(tab, 0):
+            return None
+        with self._lock:
+            current = self._snapshots.get(tab)
+        if current is not None and current.tag == tag:
+            return current
+        try:
+            entry = self.store.read(tab)
+        except Exception as e:  # e.g. written by an older release with different classes
+            print(f"Could not read the shared {tab} snapshot:", e)
+            return None
+        if entry is None:
+            return None
+        tag, loaded_at, (records, views) = entry
+        with self._lock:
+            if loaded_at <= self._written_at.get(tab, 0):
+                return None
+            snapshot = self._store(tab, records, loaded_at + self._ttl(tab), loaded_at, tag)
+            snapshot.views.update(views)
+            self._shared[tab] = self._shared.get(tab, 0) + 1
+        return snapshot
+
+    def _publish(self, snapshot):
+        """Share `snapshot` and its views through the store; returns it under the shared tag."""
+        tab = snapshot.tab
+        with self._lock:
+            if snapshot.loaded_at <= self._written_at.get(tab, 0):
+                return snapshot  # loaded before one of our writes; other workers should load their own
+        try:
+            views = {name: self._view_state(snapshot, name)
+                     for name, view in self._views.get(tab, {}).items() if getattr(view, "shared", True)}
+            tag = self.store.publish(tab, snapshot.loaded_at, (snapshot.records, views))
+        except Exception as e:
+            print(f"Could not publish the {tab} snapshot:", e)
+            return snapshot
+        with self._lock:
+            if self._snapshots.get(tab) is not snapshot:
+                return snapshot  # patched or replaced meanwhile; this worker keeps its own tag
+            shared = TabSnapshot(tab, snapshot.records, snapshot.version, tag, snapshot.loaded_at,
+                                 snapshot.expires_at)
+            shared.views = snapshot.views
+            self._snapshots[tab] = shared
+        return shared
+
+    def refresh(self, tab):
+        """Reload `tab`, keeping the last good snapshot on failure."""
+        try:
+            self._load(tab)
+        except Exception as e:
+            print(f"Snapshot refresh failed for {tab}:", e)
+
+    def _quiet_fetch(self, tab, flight, writes_before):
+        try:
+            with self.background():
+                self._fetch(tab, flight, writes_before)
+        except Exception as e:
+            print(f"Snapshot refresh failed for {tab}:", e)
+
+    def _ensure_refresher(self):
+        # Started lazily and per process, so forked gunicorn workers get their own
+        if not self.refresh_interval or self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._inflight.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="sheet-cache-refresher", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            with self._lock:
+                due = [tab for tab, snapshot in self._snapshots.items()
+                       if snapshot.age() >= self.refresh_interval and tab not in self._inflight]
+            for tab in due:
+                with self.background():
+                    self.refresh(tab)
+
+    def stop(self):
+        self._stop.set()
+
+    def version(self, *tabs):
+        """Token that changes whenever any of `tabs` gets a new snapshot."""
+        return "-".join(snapshot.tag for snapshot in self.snapshots(*tabs))
+
+    def register_view(self, tab, name, view):
+        self._views.setdefault(tab, {})[name] = view
+
+    def view(self, tab, name):
+        return self._view_state(self.snapshot(tab), name)
+
+    def _view_state(self, snapshot, name):
+        state = snapshot.views.get(name)
+        if state is None:
+            state = snapshot.views[name] = self._views[snapshot.tab][name].build(snapshot.records)
+        return state
+
+    def _carry_views(self, old, new, patch):
+        # Caller holds the lock
+        for name, state in old.views.items():
+            view = self._views[old.tab][name]
+            if hasattr(view, patch[0]):
+                new.views[name] = getattr(view, patch[0])(state, *patch[1:])
+
+    @staticmethod
+    def _extends(old, new):
+        # Loads that reuse record objects make this an identity check for all but the tail
+        return len(new) >= len(old) and new[:len(old)] == old
+
+    def _carry_appends(self, old, new):
+        # Caller holds the lock
+        for name, state in old.views.items():
+            view = self._views[old.tab][name]
+            if hasattr(view, "append"):
+                for index in range(len(old.records), len(new.records)):
+                    state = view.append(state, index, new.records[index])
+                new.views[name] = state
+
+    def records(self, tab):
+        """The shared records of `tab`; read-only, so no per-request copies."""
+        return self.snapshot(tab).records
+
+    def invalidate(self, tab=None):
+        with self._lock:
+            tabs = [tab] if tab else list(self._snapshots)
+            for name in tabs:
+                self._written(name, ("invalidate",))
+                self._snapshots.pop(name, None)
+
+    def append(self, tab, row):
+        """Patch in a row we just appended to the sheet."""
+        with self._lock:
+            snapshot = self._snapshots.get(tab)
+            patch = ("append", row, len(snapshot.records) if snapshot is not None else 0)
+            self._written(tab, patch)
+            if snapshot is not None and self._patch(snapshot, patch) is None:
+                self._snapshots.pop(tab, None)
+
+    def update(self, tab, index, changes):
+        """Patch record `index` (0-based, sheet row index + 2) after update_cell calls."""
+        with self._lock:
+            patch = ("update", index, changes)
+            self._written(tab, patch)
+            snapshot = self._snapshots.get(tab)
+            if snapshot is not None and self._patch(snapshot, patch) is None:
+                self._snapshots.pop(tab, None)
+
+    def _written(self, tab, patch):
+        # Caller holds the lock
+        self._writes[tab] = self._writes.get(tab, 0) + 1
+        self._written_at[tab] = time.time()
+        if tab in self._inflight:
+            self._patches.setdefault(tab, []).append((self._writes[tab], patch))
+
+    def _patch(self, snapshot, patch):
+        """`snapshot` with `patch` applied, stored as the tab's current one; None if it can't take it."""
+        # Caller holds the lock
+        if patch[0] == "append":
+            if not snapshot.headers:
+                return None
+            record = Record.from_row(Columns.of(snapshot.headers), patch[1])
+            new = self._store(snapshot.tab, snapshot.records + [record], snapshot.expires_at, snapshot.loaded_at)
+            self._carry_views(snapshot, new, ("append", len(snapshot.records), record))
+            return new
+        _, index, changes = patch
+        if not 0 <= index < len(snapshot.records):
+            return None
+        old = snapshot.records[index]
+        record = old.replace({key: numericise_all([value])[0] if isinstance(value, str) else value
+                              for key, value in changes.items()})
+        records = list(snapshot.records)
+        records[index] = record
+        new = self._store(snapshot.tab, records, snapshot.expires_at, snapshot.loaded_at)
+        self._carry_views(snapshot, new, ("update", index, old, record))
+        return new
+
+    def stats(self):
+        with self._lock:
+            tabs = set(self._snapshots) | set(self._hits) | set(self._misses) | set(self._errors) | set(self._shared)
+            result = {}
+            for tab in sorted(tabs):
+                snapshot = self._snapshots.get(tab)
+                result[tab] = {
+                    "hits": self._hits.get(tab, 0),
+                    "stale_hits": self._stale_hits.get(tab, 0),
+                    "misses": self._misses.get(tab, 0),
+                    "errors": self._errors.get(tab, 0),
+                    "shared": self._shared.get(tab, 0),
+                    "version": self._versions.get(tab, 0),
+                    "rows": len(snapshot.records) if snapshot else 0,
+                    "age": round(snapshot.age(), 3) if snapshot else None,
+                }
+            return result
@@ -0,0 +1,97 @@
+"""Tab snapshots shared by every worker process on a host.
+
+Each tab is one file, `<tab>.snap`: a fixed header (magic, tag, load time,
+payload length) followed by the pickled records and prebuilt views. A worker
+that has to load a tab takes `<tab>.lock` (flock) first, so while one worker
+reads the sheet the others wait and then map the file it wrote instead of
+spending their own Sheets quota. Files are written beside the target and
+renamed over it, so readers see either the old version or the new one.
+
+Payloads are pickles, so the directory must belong to this user and not be
+writable by anyone else; `SnapshotStore` refuses one that is.
+"""
+
+import mmap
+import os
+import pickle
+import re
+import stat
+import struct
+import tempfile
+import uuid
+from contextlib import ExitStack, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): workers still share files, but may load the same tab at once
+    fcntl = None
+
+MAGIC = b"HELPOSN1"
+HEADER = struct.Struct("<8s32sdQ")  # magic, tag, loaded_at, payload length
+
+
+class SnapshotStore:
+    def __init__(self, directory):
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.stat(directory)
+        if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+            raise ValueError(f"{directory} must be owned by this user and not group/world-writable")
+        self.directory = directory
+
+    def _path(self, tab, suffix):
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", tab) + suffix)
+
+    @contextmanager
+    def lock(self, *tabs):
+        """Hold the cross-process load lock of every tab in `tabs` (taken in a fixed order)."""
+        with ExitStack() as stack:
+            for tab in sorted(set(tabs)):
+                f = stack.enter_context(open(self._path(tab, ".lock"), "a+b"))
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)  # released when the file closes
+            yield
+
+    def peek(self, tab):
+        """(tag, loaded_at) of the published snapshot of `tab`, or None."""
+        try:
+            with open(self._path(tab, ".snap"), "rb") as f:
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(header) < HEADER.size:
+            return None
+        magic, tag, loaded_at, _ = HEADER.unpack(header)
+        return (tag.decode(), loaded_at) if magic == MAGIC else None
+
+    def read(self, tab):
+        """(tag, loaded_at, payload) of the published snapshot of `tab`, or None."""
+        try:
+            f = open(self._path(tab, ".snap"), "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, tag, loaded_at, size = HEADER.unpack_from(mapped)
+                if magic != MAGIC or HEADER.size + size > len(mapped):
+                    return None
+                with memoryview(mapped)[HEADER.size:HEADER.size + size] as body:
+                    payload = pickle.loads(body)
+                return tag.decode(), loaded_at, payload
+
+    def publish(self, tab, loaded_at, payload):
+        """Replace the published snapshot of `tab` with `payload` (any picklable); returns its new tag."""
+        data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        tag = uuid.uuid4().hex
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, tag.encode(), loaded_at, len(data)))
+                f.write(data)
+            os.replace(tmp, self._path(tab, ".snap"))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return tag
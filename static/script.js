@@ -17,22 +17,51 @@ document.addEventListener("DOMContentLoaded", function () {
       </div>`;
   }
 
-  // Fetch vendors from API
-  function fetchVendors(query = "", category = "") {
+  // Paging state for the current search
+  let currentQuery = "";
+  let currentCategory = "";
+  let nextCursor = null;
+  let loading = false;
+  let requestId = 0;
+
+  // Fetch vendors from API; pass a cursor to append the next page
+  function fetchVendors(query = "", category = "", cursor = null) {
     if (!vendorList) return;
-    showLoader();
-    fetch(`/api/vendors?query=${encodeURIComponent(query)}&category=${encodeURIComponent(category)}`)
+    const id = cursor ? requestId : ++requestId;
+    if (!cursor) {
+      currentQuery = query;
+      currentCategory = category;
+      nextCursor = null;
+      showLoader();
+    }
+    loading = true;
+    const params = new URLSearchParams({ query, category, sort: "rating", min_rating: 4 });
+    if (cursor) params.set("cursor", cursor);
+    fetch(`/api/vendors?${params}`)
       .then(res => res.json())
       .then(data => {
-        const filtered = data.filter(v => !v.average_rating || v.average_rating >= 4);
-        const sorted = filtered.sort((a, b) => (b.average_rating || 0) - (a.average_rating || 0));
-        displayVendors(sorted);
+        if (id !== requestId) return; // a newer search replaced this one
+        nextCursor = data.next_cursor;
+        displayVendors(data.vendors, Boolean(cursor));
       })
       .catch(() => {
-        vendorList.innerHTML = "<p class='text-danger text-center'>Failed to load vendor list.</p>";
+        if (!cursor) {
+          vendorList.innerHTML = "<p class='text-danger text-center'>Failed to load vendor list.</p>";
+        }
+      })
+      .finally(() => {
+        if (id === requestId) loading = false;
       });
   }
 
+  // Load the next page when the user nears the bottom of the list
+  window.addEventListener("scroll", () => {
+    if (!vendorList || loading || !nextCursor) return;
+    if (vendorList.getBoundingClientRect().bottom - window.innerHeight < 300) {
+      fetchVendors(currentQuery, currentCategory, nextCursor);
+    }
+  }, { passive: true });
+
   // Convert numeric rating → stars
   function getStars(rating) {
     const full = Math.floor(rating);
@@ -42,15 +71,15 @@ document.addEventListener("DOMContentLoaded", function () {
     return stars.padEnd(5, '☆');
   }
 
-  // Render vendor cards
-  function displayVendors(vendors) {
+  // Render vendor cards, replacing the list or appending a further page
+  function displayVendors(vendors, append = false) {
     if (!vendorList) return;
     if (!vendors.length) {
-      vendorList.innerHTML = "<p class='text-muted text-center'>No vendors found.</p>";
+      if (!append) vendorList.innerHTML = "<p class='text-muted text-center'>No vendors found.</p>";
       return;
     }
 
-    vendorList.innerHTML = vendors.map(v => {
+    const html = vendors.map(v => {
       const address = [
         v.plot_info, v.building_info, v.street, v.landmark,
         v.area, v.city, v.state, v.pincode
@@ -89,6 +118,12 @@ document.addEventListener("DOMContentLoaded", function () {
           </div>
         </div>`;
     }).join("");
+
+    if (append) {
+      vendorList.insertAdjacentHTML("beforeend", html);
+    } else {
+      vendorList.innerHTML = html;
+    }
   }
 
   // Event listeners for live search + filter
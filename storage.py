@@ -0,0 +1,370 @@
+"""Storage backends behind the google_sheets API.
+
+Every backend speaks in tabs (vendors, reviews, leads, ads) and sheet-style
+rows: `load_records` returns get_all_records()-shaped (read-only) records, and rows are
+addressed by sheet row number (header = row 1). `SheetsStorage` is the live
+spreadsheet; `SqliteStorage` keeps one table per tab in a local file for
+development, load tests and offline use. Both are read a whole tab at a time
+(the snapshot cache answers lookups), so the tables carry no column indexes.
+
+Copy data between them with:
+
+    python storage.py --from sheets --to sqlite
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from gspread.utils import rowcol_to_a1
+
+import config
+import metrics
+from records import parse_records
+
+# Headers used when a SQLite table is created from scratch. A sync copies the
+# source tab's real headers instead.
+DEFAULT_HEADERS = {
+    config.VENDOR_SHEET: [
+        "business_name", "pincode", "city", "state", "plot_info", "building_info", "street",
+        "landmark", "area", "category", "phone", "photos", "description", "service_hours",
+        "email", "password", "confirm_password", "subscription", "created_at", "updated_at",
+    ],
+    config.REVIEW_SHEET: ["VendorPhone", "UserName", "Rating", "Photo", "Comment", "Timestamp"],
+    config.LEADS_SHEET: ["user_name", "user_phone ", "message ", "timestamp ", "vendor_phone"],
+    config.ADS_SHEET: ["title", "image", "link"],
+}
+
+TABS = (config.VENDOR_SHEET, config.REVIEW_SHEET, config.LEADS_SHEET, config.ADS_SHEET)
+
+
+class Storage:
+    def load_records(self, tab):
+        return parse_records(self.load_values(tab))
+
+    def load_values(self, tab):
+        """Raw cell strings: [headers] + rows."""
+        raise NotImplementedError
+
+    def load_rows(self, tab, start, width=None):
+        """Raw cell strings of sheet rows `start` (1 = headers) to the end; `width` columns suffice."""
+        return self.load_values(tab)[start - 1:]
+
+    def load_ranges(self, ranges):
+        """Rows for each (tab, start, width) in `ranges`, as load_rows would return them."""
+        return [self.load_values(tab) if start <= 1 else self.load_rows(tab, start, width)
+                for tab, start, width in ranges]
+
+    def headers(self, tab):
+        raise NotImplementedError
+
+    def append_rows(self, tab, rows):
+        raise NotImplementedError
+
+    def update_cells(self, tab, row_index, changes, columns):
+        """Set `changes` ({header: value}) on sheet row `row_index`; `columns` maps header -> column."""
+        raise NotImplementedError
+
+    def replace_values(self, tab, values):
+        """Overwrite the whole tab with [headers] + rows."""
+        raise NotImplementedError
+
+
+def _rows_from(start, width):
+    """e.g. "A101:F": every row from 101 down, without refetching rows 1-100."""
+    return f"A{start}:" + (re.sub(r"\d+$", "", rowcol_to_a1(1, width)) if width else "ZZZ")
+
+
+class SheetsStorage(Storage):
+    def __init__(self, worksheet, scheduler=None):
+        self.worksheet = worksheet  # tab name -> gspread Worksheet
+        self.scheduler = scheduler  # quota.SheetsScheduler, or None to call straight through
+
+    def _read(self, tab, op, call, *args):
+        def timed():
+            with metrics.sheets_call(tab, op):
+                return call()
+        # Identical reads (same tab, op and arguments) in flight at once share one call
+        return self.scheduler.read((tab, op) + args, timed) if self.scheduler else timed()
+
+    def _write(self, tab, op, call):
+        def timed():
+            with metrics.sheets_call(tab, op):
+                return call()
+        return self.scheduler.write(timed) if self.scheduler else timed()
+
+    def load_values(self, tab):
+        return self._read(tab, "get_all_values", lambda: self.worksheet(tab).get_all_values())
+
+    def load_rows(self, tab, start, width=None):
+        cells = _rows_from(start, width)
+        return self._read(tab, "get_rows", lambda: [list(row) for row in self.worksheet(tab).get(cells)], cells)
+
+    def load_ranges(self, ranges):
+        if len(ranges) < 2:
+            return super().load_ranges(ranges)
+        names = []
+        for tab, start, width in ranges:
+            quoted = "'" + tab.replace("'", "''") + "'"
+            if start <= 1:
+                names.append(quoted)
+            else:
+                names.append(f"{quoted}!{_rows_from(start, width)}")
+        tabs = ",".join(tab for tab, _, _ in ranges)
+        # One values_batch_get for every tab: a single round trip and a single unit of read quota
+        spreadsheet = self.worksheet(ranges[0][0]).spreadsheet
+        response = self._read(tabs, "values_batch_get", lambda: spreadsheet.values_batch_get(names), *names)
+        return [[list(row) for row in value_range.get("values", [])] for value_range in response["valueRanges"]]
+
+    def headers(self, tab):
+        return self._read(tab, "row_values", lambda: self.worksheet(tab).row_values(1))
+
+    def append_rows(self, tab, rows):
+        self._write(tab, "append_rows", lambda: self.worksheet(tab).append_rows(rows))
+
+    def update_cells(self, tab, row_index, changes, columns):
+        data = [{"range": rowcol_to_a1(row_index, columns[name]), "values": [[value]]}
+                for name, value in changes.items()]
+        self._write(tab, "batch_update",
+                    lambda: self.worksheet(tab).batch_update(data, value_input_option="USER_ENTERED"))
+
+    def replace_values(self, tab, values):
+        # Write over the old rows first and only then cut what's left below and to the right,
+        # so a failure part way leaves the old data or the new (plus a stale tail), never an empty tab
+        width = max((len(row) for row in values), default=1)
+        padded = [list(row) + [""] * (width - len(row)) for row in values] or [[""]]
+
+        def replace():
+            sheet = self.worksheet(tab)
+            if sheet.row_count < len(padded) or sheet.col_count < width:
+                sheet.resize(rows=max(sheet.row_count, len(padded)), cols=max(sheet.col_count, width))
+            sheet.update("A1", padded)
+            sheet.resize(rows=len(padded), cols=width)
+        self._write(tab, "replace_values", replace)
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SqliteStorage(Storage):
+    """One table per tab: an autoincrement row_id (sheet row order) plus a TEXT column per header."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ready = set()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _table(self, tab):
+        conn = self._conn()
+        if tab not in self._ready:
+            with self._lock:
+                if tab not in self._ready:
+                    self._create(conn, tab, DEFAULT_HEADERS.get(tab, []), replace=False)
+                    self._ready.add(tab)
+        return conn
+
+    def _create(self, conn, tab, headers, replace):
+        if replace:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(tab)}")
+        columns = "".join(f", {_quote(header)} TEXT NOT NULL DEFAULT ''" for header in headers)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(tab)} (row_id INTEGER PRIMARY KEY AUTOINCREMENT{columns})")
+
+    def _headers(self, conn, tab):
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(tab)})") if row[1] != "row_id"]
+
+    def headers(self, tab):
+        return self._headers(self._table(tab), tab)
+
+    def load_values(self, tab):
+        conn = self._table(tab)
+        headers = self._headers(conn, tab)
+        if not headers:
+            return []
+        rows = conn.execute(f"SELECT {', '.join(map(_quote, headers))} FROM {_quote(tab)} ORDER BY row_id")
+        return [headers] + [list(row) for row in rows]
+
+    def load_rows(self, tab, start, width=None):
+        conn = self._table(tab)
+        headers = self._headers(conn, tab)
+        if not headers:
+            return []
+        rows = conn.execute(f"SELECT {', '.join(map(_quote, headers))} FROM {_quote(tab)} ORDER BY row_id"
+                            f" LIMIT -1 OFFSET ?", (max(start - 2, 0),))
+        return ([headers] if start <= 1 else []) + [list(row) for row in rows]
+
+    def append_rows(self, tab, rows):
+        conn = self._table(tab)
+        headers = self._headers(conn, tab)
+        placeholders = ", ".join("?" * len(headers))
+        padded = [[str(v) for v in row[:len(headers)]] + [""] * (len(headers) - len(row)) for row in rows]
+        conn.executemany(f"INSERT INTO {_quote(tab)} ({', '.join(map(_quote, headers))}) VALUES ({placeholders})",
+                         padded)
+
+    def update_cells(self, tab, row_index, changes, columns):
+        conn = self._table(tab)
+        assignments = ", ".join(f"{_quote(name)} = ?" for name in changes)
+        # Sheet rows are positional, so address the (row_index - 1)th row by order
+        conn.execute(
+            f"UPDATE {_quote(tab)} SET {assignments} WHERE row_id ="
+            f" (SELECT row_id FROM {_quote(tab)} ORDER BY row_id LIMIT 1 OFFSET ?)",
+            [str(value) for value in changes.values()] + [row_index - 2],
+        )
+
+    def replace_values(self, tab, values):
+        conn = self._conn()
+        headers = values[0] if values else DEFAULT_HEADERS.get(tab, [])
+        with self._lock:
+            conn.execute("BEGIN")
+            try:
+                self._create(conn, tab, headers, replace=True)
+                self._ready.add(tab)
+                if len(values) > 1:
+                    placeholders = ", ".join("?" * len(headers))
+                    conn.executemany(
+                        f"INSERT INTO {_quote(tab)} ({', '.join(map(_quote, headers))}) VALUES ({placeholders})",
+                        [[str(v) for v in row[:len(headers)]] + [""] * (len(headers) - len(row)) for row in values[1:]],
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+
+def _trimmed(row):
+    row = [str(value) for value in row]
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class DeltaSync:
+    """Incremental `load_records` for tabs that only ever grow by appended rows.
+
+    Keeps each tab's parsed records and, on later loads, reads only the rows
+    after the last one it has, starting one row early: if that row no longer
+    matches (someone edited or deleted rows by hand), or `full_interval`
+    seconds have passed, the tab is read in full again.
+    """
+
+    def __init__(self, backend, tabs, full_interval=900):
+        self.backend = backend
+        self.tabs = set(tabs)
+        self.full_interval = full_interval
+        self._tabs = {}  # tab -> (headers, records, last raw row, last full load)
+        self._lock = threading.Lock()
+        self.full_loads = 0
+        self.delta_loads = 0
+
+    def load_records(self, tab):
+        """A new list of records (callers may extend it); loads of one tab must not overlap."""
+        if tab not in self.tabs:
+            return self.backend.load_records(tab)
+        return self.load_many([tab])[tab]
+
+    def load_many(self, tabs):
+        """{tab: new list of records}, reading every tab's full or new-rows range in one backend call."""
+        plans = {tab: self._plan(tab) for tab in tabs}
+        ranges = self.backend.load_ranges([(tab, start, width) for tab, (start, width, _) in plans.items()])
+        results = {}
+        for (tab, plan), rows in zip(plans.items(), ranges):
+            records = self._apply(tab, plan, rows)
+            if records is None:
+                print(f"{tab} changed above row {plan[0]}; reloading it in full.")
+                records = self._apply(tab, (1, None, None), self.backend.load_values(tab))
+            results[tab] = records
+        return results
+
+    def _plan(self, tab):
+        """(first sheet row to read, columns, state it extends); row 1 and no state means a full read."""
+        with self._lock:
+            state = self._tabs.get(tab)
+        if state is None or time.time() - state[3] >= self.full_interval:
+            return 1, None, None
+        headers, records = state[0], state[1]
+        return len(records) + 1, len(headers), state
+
+    def _apply(self, tab, plan, rows):
+        start, _, state = plan
+        if state is None:
+            records = parse_records(rows)
+            with self._lock:
+                if tab in self.tabs and rows:
+                    self._tabs[tab] = (rows[0], records, _trimmed(rows[-1]), time.time())
+                else:
+                    self._tabs.pop(tab, None)
+                self.full_loads += 1
+            return list(records)
+
+        headers, records, last_row, full_at = state
+        if not rows or _trimmed(rows[0]) != last_row:
+            return None  # caller falls back to a full read
+        with self._lock:
+            if len(rows) > 1:
+                records = records + parse_records([headers] + rows[1:])
+                self._tabs[tab] = (headers, records, _trimmed(rows[-1]), full_at)
+            self.delta_loads += 1
+        return list(records)
+
+    def reset(self, tab=None):
+        """Forget what's been read, so the next load of `tab` (or every tab) is a full one."""
+        with self._lock:
+            if tab:
+                self._tabs.pop(tab, None)
+            else:
+                self._tabs.clear()
+
+
+def create_storage(name, worksheet=None, sqlite_path=None, scheduler=None):
+    if name == "sheets":
+        return SheetsStorage(worksheet, scheduler)
+    if name == "sqlite":
+        return SqliteStorage(sqlite_path or config.SQLITE_PATH)
+    raise ValueError(f"Unknown storage backend: {name!r}")
+
+
+def sync(source, target, tabs=TABS):
+    """Copy every tab in `tabs` from `source` to `target`, replacing what target held."""
+    counts = {}
+    for tab in tabs:
+        values = source.load_values(tab)
+        target.replace_values(tab, values)
+        counts[tab] = max(len(values) - 1, 0)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy Helpo data between storage backends.")
+    parser.add_argument("--from", dest="source", choices=["sheets", "sqlite"], required=True)
+    parser.add_argument("--to", dest="target", choices=["sheets", "sqlite"], required=True)
+    parser.add_argument("--sqlite-path", default=config.SQLITE_PATH)
+    parser.add_argument("--tabs", nargs="+", default=list(TABS))
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("--from and --to must differ")
+
+    from google_sheets import scheduler, sheets
+
+    def worksheet(tab):
+        return sheets.worksheet(config.GOOGLE_SHEET_NAME, tab)
+
+    source = create_storage(args.source, worksheet, args.sqlite_path, scheduler)
+    target = create_storage(args.target, worksheet, args.sqlite_path, scheduler)
+    for tab, rows in sync(source, target, args.tabs).items():
+        print(f"{tab}: {rows} rows copied {args.source} -> {args.target}")
+
+
+if __name__ == "__main__":
+    main()
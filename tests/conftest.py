@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before config is imported: a throwaway journal, the Sheets code path, no shared store
+_workdir = tempfile.mkdtemp(prefix="helpo-tests-")
+os.environ["WRITE_QUEUE_PATH"] = os.path.join(_workdir, "write_queue.sqlite3")
+os.environ["STORAGE_BACKEND"] = "sheets"
+os.environ["SHARED_SNAPSHOT_DIR"] = ""
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll `condition` until it's true; fails the test after `timeout` seconds."""
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def site():
+    """The app on a seeded FakeSpreadsheet: (test client, fake, vendor phones)."""
+    import google_sheets
+    from app import app
+    from bench.fake_sheets import FakeSpreadsheet
+    from bench.routes import seed
+    from fragments import fragments
+    from storage import SheetsStorage
+
+    tabs, phones = seed(20, random.Random(1))
+    fake = FakeSpreadsheet(tabs)
+    google_sheets.backend = google_sheets.delta.backend = SheetsStorage(fake.worksheet, google_sheets.scheduler)
+    google_sheets.delta.reset()
+    google_sheets.cache.invalidate()
+    fragments.clear()
+    yield app.test_client(), fake, phones
+    wait_for(lambda: not google_sheets.writes.stats())  # leave no rows for the next test's sheet
@@ -0,0 +1,34 @@
+from flask import Flask
+
+from conditional import versioned
+
+VERSION = ["v1"]
+
+
+def client():
+    app = Flask(__name__)
+
+    @app.route("/thing/<name>")
+    @versioned(lambda: VERSION[0], max_age=30, stale_while_revalidate=60)
+    def thing(name):
+        return ("missing", 404) if name == "gone" else f"hello {name}"
+
+    return app.test_client()
+
+
+def test_unchanged_data_is_answered_with_304():
+    web = client()
+    first = web.get("/thing/a")
+    assert first.status_code == 200 and first.headers["Cache-Control"].startswith("public, max-age=30")
+    again = web.get("/thing/a", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.get_data() == b""
+
+    assert web.get("/thing/b").headers["ETag"] != first.headers["ETag"]
+    VERSION[0] = "v2"
+    assert web.get("/thing/a", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_errors_pass_through_uncached():
+    response = client().get("/thing/gone")
+    assert response.status_code == 404 and response.get_data() == b"missing"
+    assert "ETag" not in response.headers and "Cache-Control" not in response.headers
@@ -0,0 +1,67 @@
+from fragments import FragmentCache
+
+
+class Build:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"<p>{self.calls}</p>"
+
+
+def test_fragment_is_rendered_again_only_when_its_version_changes():
+    cache, build = FragmentCache(), Build()
+    assert cache.render("card", "900", ("a",), build) == "<p>1</p>"
+    assert cache.render("card", " 900 ", ("a",), build) == "<p>1</p>"
+    assert cache.render("card", "900", ("b",), build) == "<p>2</p>"
+    assert (build.calls, cache.hits, cache.misses) == (2, 1, 2)
+
+
+def test_least_recently_used_fragments_are_evicted():
+    cache, build = FragmentCache(max_entries=2), Build()
+    cache.render("card", "1", 0, build)
+    cache.render("card", "2", 0, build)
+    cache.render("card", "1", 0, build)
+    cache.render("card", "3", 0, build)
+    assert len(cache) == 2
+    cache.render("card", "1", 0, build)
+    assert build.calls == 3
+    cache.render("card", "2", 0, build)
+    assert build.calls == 4
+
+
+def test_invalidate_drops_every_kind_for_the_vendor():
+    cache, build = FragmentCache(), Build()
+    for kind in ("card", "info"):
+        cache.render(kind, "1", 0, build)
+    cache.render("card", "2", 0, build)
+    cache.invalidate("1")
+    assert len(cache) == 1
+
+
+def test_pages_reuse_fragments_and_rerender_what_a_review_changed(site):
+    from fragments import fragments
+
+    client, fake, phones = site
+    home = client.get("/").get_data(as_text=True)
+    misses = fragments.misses
+    assert client.get("/").get_data(as_text=True) == home
+    assert fragments.misses == misses
+
+    phone = phones[0]
+    client.get(f"/vendor/{phone}")
+    page = client.post(f"/vendor/{phone}", data={"name": "Asha", "rating": "5", "comment": "Fixed it fast"})
+    assert "Fixed it fast" in page.get_data(as_text=True)
+
+
+def test_cards_rendered_inside_the_page_are_timed_as_part_of_it(site):
+    import metrics
+
+    def renders():
+        return metrics.phases._series.get(("render",), [0, 0])[-2]
+
+    client, _, _ = site
+    before = renders()
+    client.get("/")
+    assert renders() == before + 1
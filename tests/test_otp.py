@@ -0,0 +1,42 @@
+import pytest
+
+from bench.fake_otp import FakeSMTPServer, FakeTwoFactorServer, serve
+from conftest import wait_for
+from otp import MailQueue, SMTPPool, TwoFactorClient
+
+
+@pytest.fixture
+def two_factor():
+    server = serve(FakeTwoFactorServer(("127.0.0.1", 0)))
+    host, port = server.server_address
+    yield TwoFactorClient("key", f"http://{host}:{port}/API/V1"), server
+    server.shutdown()
+
+
+@pytest.fixture
+def smtp():
+    server = serve(FakeSMTPServer(("127.0.0.1", 0), drop_after=1))
+    yield server
+    server.shutdown()
+
+
+def test_sms_otp_round_trip(two_factor):
+    client, server = two_factor
+    sent = client.send("919876543210")
+    assert sent["Status"] == "Success"
+    assert client.verify(sent["Details"], "123456")["Status"] == "Success"
+    assert client.verify(sent["Details"], "000000")["Status"] == "Error"
+    assert server.requests == 3
+
+
+def test_mail_survives_a_server_that_hangs_up(smtp):
+    host, port = smtp.server_address
+    pool = SMTPPool(host, port, "sender@x.com", "pw", size=1, starttls=False)
+    mail = MailQueue(pool, workers=1, retry_delay=0.01)
+    for i in range(3):
+        mail.submit("sender@x.com", [f"user{i}@x.com"], f"Subject: OTP\n\n{i}")
+
+    wait_for(lambda: len(smtp.messages) == 3)
+    assert [recipients for _, recipients, _ in smtp.messages] == [[f"user{i}@x.com"] for i in range(3)]
+    assert smtp.connections >= 2
+    pool.close()
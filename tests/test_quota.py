@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+import quota
+from quota import SheetsScheduler, TokenBucket
+
+
+class QuotaError(Exception):
+    class response:
+        status_code = 429
+        headers = {"Retry-After": "0.01"}
+
+
+class Failing:
+    """Call that hits the quota every time, counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        raise QuotaError()
+
+
+def test_waiters_are_served_by_priority():
+    bucket = TokenBucket(600, burst=1)  # a token every 0.1s
+    bucket.acquire()
+    order = []
+
+    def take(name, priority):
+        bucket.acquire(priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=take, args=("background", 1))]
+    threads[0].start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=take, args=("request", 0)))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    assert order == ["request", "background"]
+
+
+def test_identical_reads_in_flight_share_one_call():
+    scheduler = SheetsScheduler(0, 0)
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.1)
+        return "rows"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.read(("Tab", "get"), call)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["rows"] * 5 and len(calls) == 1
+    assert scheduler.stats()["coalesced"] == 4
+
+
+def test_retries_depend_on_who_is_waiting():
+    scheduler = SheetsScheduler(0, 0, attempts=4, foreground_attempts=2)
+
+    request = Failing()
+    with pytest.raises(QuotaError):
+        scheduler.read(("Tab", "get"), request)
+    assert request.calls == 2
+
+    refresh = Failing()
+    with quota.background(), pytest.raises(QuotaError):
+        scheduler.read(("Tab", "get"), refresh)
+    assert refresh.calls == 1  # the cache keeps serving the last snapshot
+
+    flush = Failing()
+    with quota.background(), pytest.raises(QuotaError):
+        scheduler.write(flush)
+    assert flush.calls == 4
+
+
+def test_requests_give_up_at_their_deadline():
+    scheduler = SheetsScheduler(1, 1, burst=1, foreground_deadline=0.2)
+    scheduler.reads.acquire()  # the next token is a minute away
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        scheduler.read(("Tab", "get"), lambda: "rows")
+    assert time.monotonic() - started < 1
+    assert scheduler.stats()["timeouts"] == 1
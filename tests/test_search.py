@@ -0,0 +1,53 @@
+from geo import GeoView
+from indexes import NO_RATINGS
+from ranking import RankingView
+from search import query_vendors
+from test_views import vendor, vendor_cache
+
+PINCODES = {"560000": (12.97, 77.59), "560001": (13.5, 77.59), "560002": (18.5, 73.85)}
+
+
+def near_me(cache, pincodes, **params):
+    cache.register_view("V", "geo", GeoView(pincodes))
+    records = cache.records("V")
+    return query_vendors(records, lambda phone: NO_RATINGS, near=(12.97, 77.59), geo=cache.view("V", "geo"),
+                         **params)
+
+
+def test_near_me_lists_positioned_vendors_nearest_first():
+    page, _, total = near_me(vendor_cache(3), PINCODES, city="mysore", limit=10)
+    assert [item["pincode"] for item in page] == [560000, 560001, 560002]  # the city gives way to distance
+    assert page[0]["distance_km"] == 0 and total == 3
+
+    page, _, _ = near_me(vendor_cache(3), PINCODES, radius_km=100, limit=10)
+    assert [item["pincode"] for item in page] == [560000, 560001]
+
+
+def test_near_me_without_a_pincode_table_falls_back_to_the_city():
+    page, _, total = near_me(vendor_cache(3), {}, city="pune", limit=10)
+    assert [item["business_name"] for item in page] == [vendor(0)[0], vendor(2)[0]] and total == 2
+
+
+def test_near_me_page_without_a_pincode_table_lists_vendors(site):
+    client, _, _ = site
+
+    def cards(url):
+        return client.get(url).get_data(as_text=True).count('class="vendor-card"')
+
+    assert cards("/?lat=12.97&lon=77.59&location=pune") == cards("/?location=pune") > 0
+    assert cards("/?lat=12.97&lon=77.59") == cards("/") > 0
+
+
+def ranked_listing(**params):
+    cache = vendor_cache(6)
+    cache.register_view("V", "ranking", RankingView(dict))
+    page, _, _ = query_vendors(cache.records("V"), lambda phone: NO_RATINGS, ranking=cache.view("V", "ranking"),
+                               limit=10, **params)
+    return [item["subscription"] for item in page]
+
+
+def test_filtered_and_sorted_listings_keep_the_tier_order():
+    assert ranked_listing() == ["Premium"] * 3 + ["free"] * 3
+    assert ranked_listing(query="plumber") == ["Premium", "free"]
+    assert ranked_listing(min_rating=4) == ["Premium"] * 3 + ["free"] * 3
+    assert ranked_listing(sort="rating") == ["Premium"] * 3 + ["free"] * 3  # nobody has ratings: a tie
@@ -0,0 +1,204 @@
+import threading
+import time
+
+from conftest import wait_for
+from indexes import VendorIndex
+from records import parse_records
+from sheet_cache import SnapshotCache
+
+HEADERS = ["business_name", "phone", "email"]
+
+
+def vendors(count):
+    return parse_records([HEADERS] + [[f"Biz{i}", str(9000000000 + i), f"v{i}@x.com"] for i in range(count)])
+
+
+class Loader:
+    """Loader that counts its calls, optionally sleeping or failing."""
+
+    def __init__(self, records, delay=0.0):
+        self.records = records
+        self.delay = delay
+        self.calls = 0
+        self.error = None
+        self._lock = threading.Lock()
+
+    def __call__(self, tab):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return list(self.records)
+
+
+class CountingView(VendorIndex):
+    def __init__(self):
+        self.builds = 0
+
+    def build(self, records):
+        self.builds += 1
+        return super().build(records)
+
+
+def test_snapshot_is_served_until_its_ttl():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader, ttl=0.2, max_stale=0)
+    first = cache.records("V")
+    assert cache.records("V") is first
+    assert loader.calls == 1
+
+    time.sleep(0.25)
+    assert cache.records("V") is not first
+    assert loader.calls == 2
+
+
+def test_concurrent_misses_share_one_load():
+    loader = Loader(vendors(3), delay=0.1)
+    cache = SnapshotCache(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.snapshot("V"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.calls == 1
+    assert len({id(snapshot) for snapshot in results}) == 1
+
+
+def test_stale_snapshot_is_served_while_one_background_load_runs():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader, ttl=0.05, max_stale=60)
+    old = cache.snapshot("V")
+    time.sleep(0.1)
+    loader.delay = 0.2
+
+    started = time.time()
+    assert cache.snapshot("V") is old
+    assert cache.snapshot("V") is old
+    assert time.time() - started < 0.1
+    wait_for(lambda: cache.snapshot("V") is not old)
+    assert loader.calls == 2
+    assert cache.stats()["V"]["stale_hits"] >= 2
+
+
+def test_failed_refresh_keeps_the_last_snapshot():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader)
+    snapshot = cache.snapshot("V")
+    loader.error = RuntimeError("quota")
+    cache.refresh("V")
+    assert cache.snapshot("V") is snapshot
+    assert cache.stats()["V"]["errors"] == 1
+
+
+def test_appends_and_updates_patch_records_and_views():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader)
+    view = CountingView()
+    cache.register_view("V", "lookup", view)
+    before = cache.view("V", "lookup")
+
+    cache.append("V", ["New", "9999999999", "new@x.com"])
+    row, record = cache.view("V", "lookup").by_phone("9999999999")
+    assert (row, record["business_name"]) == (5, "New")
+
+    cache.update("V", 0, {"email": "changed@x.com"})
+    lookup = cache.view("V", "lookup")
+    assert lookup.by_email("v0@x.com") == (None, None)
+    assert lookup.by_email("changed@x.com")[1]["business_name"] == "Biz0"
+    assert cache.records("V")[0]["email"] == "changed@x.com"
+    assert before.by_phone("9999999999") == (None, None)  # requests holding it see no change
+    assert before.by_email("v0@x.com")[0] == 2
+
+    assert loader.calls == 1 and view.builds == 1
+
+
+def test_update_outside_the_snapshot_drops_it():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader)
+    cache.records("V")
+    cache.update("V", 10, {"email": "x"})
+    cache.records("V")
+    assert loader.calls == 2
+
+
+def test_cold_tabs_are_loaded_in_one_batch():
+    loader = Loader(vendors(3))
+    batches = []
+
+    def batch_loader(tabs):
+        batches.append(sorted(tabs))
+        return {tab: vendors(2) for tab in tabs}
+
+    cache = SnapshotCache(loader, batch_loader=batch_loader)
+    a, b = cache.snapshots("A", "B")
+    assert batches == [["A", "B"]]
+    assert len(a.records) == len(b.records) == 2
+    assert loader.calls == 0
+
+
+def test_append_only_load_that_only_adds_rows_keeps_views():
+    records = vendors(3)
+    loader = Loader(records)
+    cache = SnapshotCache(loader, append_only=["V"])
+    view = CountingView()
+    cache.register_view("V", "lookup", view)
+    cache.view("V", "lookup")
+
+    loader.records = records + vendors(5)[3:]
+    cache.refresh("V")
+    assert cache.view("V", "lookup").by_phone("9000000004")[0] == 6
+    assert view.builds == 1
+
+
+def test_writes_made_during_a_load_are_replayed_on_it():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader, max_stale=60)
+    old = cache.snapshot("V")
+    expires_at = old.expires_at
+
+    loader.delay = 0.2
+    refresh = threading.Thread(target=cache.refresh, args=("V",))
+    refresh.start()
+    time.sleep(0.05)
+    # Sheet writes the refresh didn't see
+    cache.update("V", 0, {"email": "new@x.com"})
+    cache.append("V", ["New", "9999999999", "added@x.com"])
+    refresh.join()
+
+    snapshot = cache.snapshot("V")
+    assert snapshot.loaded_at > old.loaded_at  # the load is kept
+    assert [r["email"] for r in snapshot.records] == ["new@x.com", "v1@x.com", "v2@x.com", "added@x.com"]
+    assert old.expires_at == expires_at and len(old.records) == 3
+    assert loader.calls == 2
+
+
+def test_rows_a_load_already_returned_are_not_appended_again():
+    loader = Loader(vendors(3))
+    cache = SnapshotCache(loader, max_stale=60)
+    cache.records("V")
+
+    loader.delay = 0.2
+    refresh = threading.Thread(target=cache.refresh, args=("V",))
+    refresh.start()
+    time.sleep(0.05)
+    cache.append("V", ["Biz3", "9000000003", "v3@x.com"])
+    loader.records = vendors(4)  # the append reached the sheet before the read did
+    refresh.join()
+    assert [r["business_name"] for r in cache.records("V")] == ["Biz0", "Biz1", "Biz2", "Biz3"]
+
+
+def test_load_racing_an_invalidation_is_not_kept():
+    loader = Loader(vendors(3), delay=0.2)
+    cache = SnapshotCache(loader)
+    raced = []
+    reader = threading.Thread(target=lambda: raced.append(cache.records("V")))
+    reader.start()
+    time.sleep(0.05)
+    cache.invalidate("V")
+    reader.join()
+
+    loader.delay = 0
+    assert cache.records("V") is not raced[0]
+    assert loader.calls == 2
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from indexes import VendorIndex
+from records import parse_records
+from sheet_cache import SnapshotCache
+from snapshot_store import SnapshotStore
+from test_sheet_cache import CountingView, Loader, vendors
+
+
+def test_published_snapshots_read_back(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    assert store.peek("Tab") is None and store.read("Tab") is None
+
+    records = parse_records([["a", "b"], ["1", "x"]])
+    tag = store.publish("Tab", 123.0, (records, {}))
+    assert store.peek("Tab") == (tag, 123.0)
+    read_tag, loaded_at, (read_records, views) = store.read("Tab")
+    assert (read_tag, loaded_at, views) == (tag, 123.0, {})
+    assert read_records == records and read_records[0].columns is records[0].columns
+
+
+def test_directories_others_can_write_are_refused(tmp_path):
+    directory = tmp_path / "open"
+    directory.mkdir()
+    os.chmod(directory, 0o777)
+    with pytest.raises(ValueError):
+        SnapshotStore(str(directory))
+
+
+def two_workers(tmp_path, **kwargs):
+    store_dir = str(tmp_path / "snapshots")
+    workers = []
+    for _ in range(2):
+        loader, view = Loader(vendors(3)), CountingView()
+        cache = SnapshotCache(loader, store=SnapshotStore(store_dir), **kwargs)
+        cache.register_view("V", "lookup", view)
+        workers.append((cache, loader, view))
+    return workers
+
+
+def test_second_worker_takes_the_published_snapshot(tmp_path):
+    (a, a_loader, a_view), (b, b_loader, b_view) = two_workers(tmp_path)
+    a.view("V", "lookup")
+
+    assert b.view("V", "lookup").by_phone("9000000001")[0] == 3
+    assert b_loader.calls == 0 and b_view.builds == 0
+    assert b.version("V") == a.version("V")
+    assert b.stats()["V"]["shared"] == 1
+
+
+def test_writes_and_age_stop_a_worker_taking_a_publication(tmp_path):
+    (a, a_loader, _), (b, b_loader, _) = two_workers(tmp_path, ttl=0.2)
+    a.view("V", "lookup")
+
+    b.invalidate("V")  # b wrote after a loaded
+    b.records("V")
+    assert b_loader.calls == 1
+
+    time.sleep(0.25)
+    a.invalidate("V")
+    a._written_at.clear()  # only the age matters below
+    a.records("V")
+    assert a_loader.calls == 2
+
+
+def test_unshared_views_are_left_out(tmp_path):
+    class LocalView(VendorIndex):
+        shared = False
+
+    (a, _, _), (b, _, _) = two_workers(tmp_path)
+    for cache in (a, b):
+        cache.register_view("V", "local", LocalView())
+    a.view("V", "local")
+    b.records("V")
+    assert "local" not in b.snapshot("V").views and "lookup" in b.snapshot("V").views
@@ -0,0 +1,109 @@
+import pytest
+
+from bench.fake_sheets import FakeSpreadsheet
+from storage import DeltaSync, SheetsStorage, SqliteStorage, sync
+
+HEADERS = ["VendorPhone", "Name", "Rating", "Photo", "Comment", "Timestamp"]
+
+
+def review(i):
+    return [str(9000000000 + i), f"User {i}", str(1 + i % 5), "", "ok", f"2025-01-01 00:00:{i % 60:02d}"]
+
+
+def setup(rows=3, full_interval=900):
+    fake = FakeSpreadsheet({"Reviews": [HEADERS] + [review(i) for i in range(rows)],
+                            "Leads": [["vendor_phone"], ["1"]]})
+    return fake, DeltaSync(SheetsStorage(fake.worksheet), ["Reviews", "Leads"], full_interval=full_interval)
+
+
+def test_later_loads_read_only_new_rows():
+    fake, delta = setup()
+    first = delta.load_records("Reviews")
+    fake.worksheet("Reviews").append_rows([review(3), review(4)])
+
+    second = delta.load_records("Reviews")
+    assert [r["Name"] for r in second] == [f"User {i}" for i in range(5)]
+    assert all(a is b for a, b in zip(first, second))  # unchanged rows keep their records
+    assert (delta.full_loads, delta.delta_loads) == (1, 1)
+    assert fake.calls[("Reviews", "get")] == 1
+
+
+def test_rows_edited_above_the_tail_trigger_a_full_reload():
+    fake, delta = setup()
+    delta.load_records("Reviews")
+    fake.tabs["Reviews"][3] = review(9)
+    fake.worksheet("Reviews").append_row(review(4))
+
+    records = delta.load_records("Reviews")
+    assert records[2]["Name"] == "User 9"
+    assert delta.full_loads == 2
+
+
+def test_full_interval_forces_full_reads():
+    fake, delta = setup(full_interval=0)
+    delta.load_records("Reviews")
+    delta.load_records("Reviews")
+    assert (delta.full_loads, delta.delta_loads) == (2, 0)
+
+
+def test_returned_lists_are_the_callers_own():
+    fake, delta = setup()
+    delta.load_records("Reviews").append("extra")
+    assert len(delta.load_records("Reviews")) == 3
+
+
+def test_several_tabs_load_in_one_batched_read():
+    fake, delta = setup()
+    results = delta.load_many(["Reviews", "Leads"])
+    assert len(results["Reviews"]) == 3 and len(results["Leads"]) == 1
+    assert sum(count for (tab, op), count in fake.calls.items() if op == "values_batch_get") == 1
+    assert fake.total_calls() == 1
+
+
+def test_rows_flushed_during_a_load_are_counted_once(site, monkeypatch):
+    import config
+    import google_sheets
+
+    _, fake, _ = site
+    flushed, journaled = review(1), review(2)
+    fake.worksheet(config.REVIEW_SHEET).append_row(flushed)  # written, not yet out of the journal
+    monkeypatch.setattr(google_sheets.writes, "pending", lambda tab: [flushed, journaled])
+
+    records = google_sheets.load_records(config.REVIEW_SHEET)
+    names = [record["UserName"] for record in records]
+    assert names.count("User 1") == names.count("User 2") == 1
+
+
+def test_sqlite_storage_reads_back_what_it_was_given(tmp_path):
+    db = SqliteStorage(str(tmp_path / "helpo.sqlite3"))
+    db.replace_values("Reviews", [HEADERS, review(0), review(1)[:3]])
+    db.append_rows("Reviews", [review(2)])
+    db.update_cells("Reviews", 3, {"Comment": "edited"}, {})
+    values = db.load_values("Reviews")
+    assert values[0] == HEADERS and values[1] == review(0) and values[2][2:] == ["2", "", "edited", ""]
+    assert db.load_rows("Reviews", 4) == [review(2)]
+
+
+def test_sync_copies_every_tab_between_backends(tmp_path):
+    fake, _ = setup()
+    sheets, db = SheetsStorage(fake.worksheet), SqliteStorage(str(tmp_path / "helpo.sqlite3"))
+    assert sync(sheets, db, ["Reviews", "Leads"]) == {"Reviews": 3, "Leads": 1}
+
+    db.append_rows("Reviews", [review(3)])
+    fake.tabs["Reviews"].extend([review(8), review(9)])  # rows the copy back must remove
+    sync(db, sheets, ["Reviews"])
+    assert fake.tabs["Reviews"] == [HEADERS] + [review(i) for i in range(4)]
+
+
+def test_a_failed_sheet_replace_never_leaves_the_tab_empty(monkeypatch):
+    fake, _ = setup()
+    sheets, old = SheetsStorage(fake.worksheet), [list(row) for row in fake.tabs["Reviews"]]
+    worksheet = fake.worksheet("Reviews")
+
+    def quota(*args, **kwargs):
+        raise RuntimeError("429")
+
+    monkeypatch.setattr(type(worksheet), "update", quota)
+    with pytest.raises(RuntimeError):
+        sheets.replace_values("Reviews", [HEADERS, review(5)])
+    assert fake.tabs["Reviews"] == old
@@ -0,0 +1,20 @@
+import os
+
+from uploads import ImageVariants, variant_name
+
+
+def test_the_served_variant_is_remembered(tmp_path):
+    variants = ImageVariants(str(tmp_path), {"card": 10})
+    assert variants.best("a.jpg", "card", True) is None
+
+    webp = variant_name("a.jpg", "card", True)
+    os.makedirs(tmp_path / "thumbs")
+    (tmp_path / webp).write_bytes(b"x")
+    assert variants.best("a.jpg", "card", True) is None  # not looked up again yet
+
+    first = variants.version()
+    variants._version_at = 0.0  # as if VERSION_TTL had passed
+    assert variants.version() != first
+    assert variants.best("a.jpg", "card", True) == webp
+    os.remove(tmp_path / webp)
+    assert variants.best("a.jpg", "card", True) == webp  # the preferred variant is kept for good
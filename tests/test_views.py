@@ -0,0 +1,161 @@
+"""Views read by requests while our own writes patch the vendor tab."""
+
+import threading
+import time
+
+from geo import GeoView
+from indexes import LeadIndex, RatingIndex, ReviewIndex
+from ranking import RankingView
+from records import parse_records
+from search import SuggestionView
+from sheet_cache import SnapshotCache
+from test_sheet_cache import Loader
+
+HEADERS = ["business_name", "category", "city", "description", "phone", "pincode", "subscription", "created_at"]
+
+
+def vendor(i):
+    return [f"Biz{i} Services", ("Plumber", "Electrician", "Painter")[i % 3], ("Pune", "Mysore")[i % 2],
+            f"desc {i}", str(9000000000 + i), str(560000 + i % 40), ("free", "Premium")[i % 2],
+            f"2025-01-{1 + i % 28:02d} 10:00:00"]
+
+
+def vendor_cache(count=300):
+    return SnapshotCache(Loader(parse_records([HEADERS] + [vendor(i) for i in range(count)])))
+
+
+def read_while_patching(cache, read, appends=200):
+    """Run `read(cache)` in a loop while `appends` rows are patched in and every 5th row updated."""
+    errors, done = [], threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                read(cache)
+            except Exception as e:  # noqa: BLE001 - any error fails the test
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    try:
+        for i in range(appends):
+            cache.append("V", vendor(1000 + i))
+            if i % 5 == 0:
+                cache.update("V", i, {"city": "Kochi", "category": "Tutor", "pincode": str(560040 + i % 10)})
+            time.sleep(0)
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+    assert errors == []
+
+
+def test_suggestions_read_while_patching():
+    cache = vendor_cache()
+    cache.register_view("V", "suggestions", SuggestionView())
+    cache.view("V", "suggestions")
+
+    def read(cache):
+        index = cache.view("V", "suggestions")
+        for query in ("plumber", "pune", "serv"):
+            index.suggest(query, limit=1000)
+
+    read_while_patching(cache, read)
+
+
+def test_suggestion_patches_leave_the_earlier_index_alone():
+    cache = vendor_cache(3)
+    cache.register_view("V", "suggestions", SuggestionView())
+    before = cache.view("V", "suggestions")
+    cache.append("V", ["Zebra Works"] + vendor(5)[1:])
+    cache.update("V", 0, {"business_name": "Yak Works"})
+    assert before.suggest("zebra") == [] and before.suggest("yak") == []
+    assert "Biz0 Services" in before.suggest("biz0")
+    after = cache.view("V", "suggestions")
+    assert after.suggest("zebra") == ["Zebra Works"] and after.suggest("yak") == ["Yak Works"]
+
+
+def test_ranking_read_while_patching():
+    cache = vendor_cache()
+    cache.register_view("V", "ranking", RankingView(dict))
+    cache.view("V", "ranking")
+
+    def read(cache):
+        ranking = cache.view("V", "ranking")
+        for category, city in (("", "e"), ("plumber", "e")):
+            entries = list(ranking.ranked(category, city))
+            assert entries == sorted(set(entries))  # a list changing underneath repeats or skips entries
+
+    read_while_patching(cache, read)
+
+
+def test_ranking_patches_leave_the_earlier_ranking_alone():
+    cache = vendor_cache(3)
+    cache.register_view("V", "ranking", RankingView(dict))
+    before = cache.view("V", "ranking")
+    cache.append("V", vendor(1000))
+    cache.update("V", 0, {"city": "Kochi"})
+    assert sorted(index for *_, index in before.ranked(city="pune")) == [0, 2]
+    assert len(before.all) == 3
+    after = cache.view("V", "ranking")
+    assert sorted(index for *_, index in after.ranked(city="pune")) == [2, 3]
+    assert sorted(index for *_, index in after.ranked(city="kochi")) == [0]
+
+
+PINCODES = {str(560000 + i): (12.0 + i % 7 * 0.3, 77.0 + i // 7 * 0.3) for i in range(50)}
+
+
+def test_nearest_read_while_patching():
+    cache = vendor_cache()
+    cache.register_view("V", "geo", GeoView(PINCODES))
+    cache.view("V", "geo")
+
+    def read(cache):
+        index = cache.view("V", "geo")
+        for position, _ in index.nearest(12.9, 77.6):
+            index.locate(position)
+
+    read_while_patching(cache, read)
+
+
+def test_geo_patches_leave_the_earlier_index_alone():
+    cache = vendor_cache(3)
+    cache.register_view("V", "geo", GeoView(PINCODES))
+    before = cache.view("V", "geo")
+    cache.append("V", vendor(1000))
+    cache.update("V", 0, {"pincode": "560049"})
+    assert sorted(position for position, _ in before.nearest(12.0, 77.0)) == [0, 1, 2]
+    assert before.locate(0) == PINCODES["560000"]
+    after = cache.view("V", "geo")
+    assert sorted(position for position, _ in after.nearest(12.0, 77.0)) == [0, 1, 2, 3]
+    assert after.locate(0) == PINCODES["560049"]
+
+
+REVIEW_HEADERS = ["VendorPhone", "UserName", "Rating", "Photo", "Comment", "Timestamp"]
+LEAD_HEADERS = ["user_name", "user_phone ", "message ", "timestamp ", "vendor_phone"]
+
+
+def test_review_and_lead_patches_leave_the_earlier_views_alone():
+    reviews = SnapshotCache(Loader(parse_records([REVIEW_HEADERS, ["9000000000", "A", "4", "", "ok", ""]])))
+    reviews.register_view("R", "ratings", RatingIndex())
+    reviews.register_view("R", "by_vendor", ReviewIndex())
+    ratings, by_vendor = reviews.view("R", "ratings"), reviews.view("R", "by_vendor")
+    reviews.append("R", ["9000000000", "B", "2", "", "meh", ""])
+    reviews.update("R", 0, {"Rating": "5"})
+    assert (ratings["9000000000"].count, ratings["9000000000"].total) == (1, 4)
+    assert [r["UserName"] for r in by_vendor["9000000000"]] == ["A"] and by_vendor["9000000000"][0]["Rating"] == 4
+    assert reviews.view("R", "ratings")["9000000000"].total == 7
+    assert [r["Rating"] for r in reviews.view("R", "by_vendor")["9000000000"]] == [5, 2]
+
+    leads = SnapshotCache(Loader(parse_records([LEAD_HEADERS, ["A", "1", "hi", "2025-03-01 09:00:00", "9000000000"]])))
+    leads.register_view("L", "leads", LeadIndex())
+    book = leads.view("L", "leads")
+    leads.append("L", ["B", "2", "hello", "2025-03-02 09:00:00", "9000000000"])
+    leads.update("L", 0, {"vendor_phone": "9000000001"})
+    assert book.page("9000000000") == ([{"name": "A", "phone": 1, "message": "hi",
+                                         "timestamp": "2025-03-01 09:00:00"}], 1)
+    after = leads.view("L", "leads")
+    assert [lead["name"] for lead in after.page("9000000000")[0]] == ["B"]
+    assert [lead["name"] for lead in after.page("9000000001")[0]] == ["A"]
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import threading
+
+from conftest import wait_for
+from write_queue import WriteBehindQueue
+
+
+class Writer:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, tab, rows):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("503")
+            self.batches.append((tab, rows))
+
+    def rows(self):
+        with self._lock:
+            return [row for _, rows in self.batches for row in rows]
+
+
+def test_rows_are_written_in_batches_and_then_removed(tmp_path):
+    writer = Writer()
+    queue = WriteBehindQueue(str(tmp_path / "journal.sqlite3"), writer, batch_size=2)
+    for i in range(3):
+        queue.enqueue("Reviews", [str(i), "ok"])
+
+    wait_for(lambda: len(writer.rows()) == 3)
+    assert writer.rows() == [["0", "ok"], ["1", "ok"], ["2", "ok"]]
+    assert all(len(rows) <= 2 for _, rows in writer.batches)
+    wait_for(lambda: queue.pending("Reviews") == [])
+
+
+def test_failed_writes_stay_journaled_and_are_retried(tmp_path):
+    writer = Writer(failures=2)
+    queue = WriteBehindQueue(str(tmp_path / "journal.sqlite3"), writer, backoff_base=0.05, flush_interval=0.05)
+    queue.enqueue("Leads", ["a"])
+    assert queue.pending("Leads") == [["a"]]
+
+    wait_for(lambda: writer.rows() == [["a"]])
+    wait_for(lambda: not queue.stats())
+
+
+def test_rows_left_by_a_previous_run_are_replayed(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    crashed = WriteBehindQueue(path, Writer(failures=1), backoff_base=3600)
+    crashed.enqueue("Leads", ["left", "behind"])
+    wait_for(lambda: crashed.stats().get("Leads", {}).get("failures") == 1)
+
+    writer = Writer()
+    WriteBehindQueue(path, writer).start()
+    wait_for(lambda: writer.rows() == [["left", "behind"]])
+
+
+def test_rows_claimed_by_a_stuck_worker_are_retaken_after_the_lease(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    release = threading.Event()
+    stuck = WriteBehindQueue(path, lambda tab, rows: release.wait(), lease=0.2)
+    stuck.enqueue("Leads", ["x"])
+    wait_for(lambda: stuck._connect().execute("SELECT claimed_by FROM pending").fetchone()[0] is not None)
+
+    writer = Writer()
+    WriteBehindQueue(path, writer, flush_interval=0.05, lease=0.2).start()
+    wait_for(lambda: writer.rows() == [["x"]])
+    release.set()
+
+
+def test_importing_the_app_starts_no_threads():
+    # gunicorn imports the app in the master before forking; a thread there can deadlock the workers
+    check = "import threading, app; assert threading.active_count() == 1, threading.enumerate()"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", check], cwd=root, check=True)
@@ -0,0 +1,198 @@
+"""Photo uploads: content-addressed originals plus resized and WebP variants.
+
+`save_upload` streams a file into the upload folder under the hash of its
+contents, so re-uploading the same image reuses the stored copy and two
+different "photo.jpg"s never overwrite each other. A background worker then
+writes one variant per size in `config.IMAGE_SIZES` (same format, and WebP)
+under `thumbs/`. Templates ask for a size through `image_url`, which falls back
+to the original until the variants exist. Which file to serve is remembered
+per photo and size, so rendering a page doesn't stat the disk for every photo;
+`variants.version()` changes whenever a variant is written, for page ETags.
+"""
+
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from flask import url_for
+
+import config
+
+IMAGE_EXTENSIONS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".gif": "GIF", ".webp": "WEBP"}
+CHUNK_SIZE = 64 * 1024
+# Seconds a process trusts its last look at the thumbs directory's mtime
+VERSION_TTL = 1
+
+
+def _extension(filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else ".jpg"
+
+
+def variant_name(name, size, webp=False):
+    stem, ext = os.path.splitext(name)
+    return f"thumbs/{stem}-{size}{'.webp' if webp else ext.lower()}"
+
+
+class ImageVariants:
+    """Background thread that resizes originals into every configured size."""
+
+    def __init__(self, folder, sizes, quality=82):
+        self.folder = folder
+        self.sizes = sizes
+        self.quality = quality
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._ready = set()  # variants known to exist on disk
+        self._best = {}  # name -> {(size, webp): (variant or None, version() it's good for, or None for good)}
+        self._version = 0
+        self._version_at = 0.0
+
+    def start(self):
+        # One worker per process; forked gunicorn workers start their own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._queued = set()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="image-variants", daemon=True).start()
+
+    def submit(self, name):
+        self.start()
+        with self._lock:
+            if name in self._queued:
+                return
+            self._queued.add(name)
+        self._queue.put(name)
+
+    def exists(self, relative):
+        if relative in self._ready:
+            return True
+        if os.path.exists(os.path.join(self.folder, relative)):
+            self._ready.add(relative)
+            return True
+        return False
+
+    def version(self):
+        """Token that changes whenever any worker writes a variant: the thumbs directory's mtime."""
+        now = time.time()
+        if now - self._version_at > VERSION_TTL:
+            try:
+                self._version = os.stat(os.path.join(self.folder, "thumbs")).st_mtime_ns
+            except OSError:
+                self._version = 0
+            self._version_at = now
+        return self._version
+
+    def best(self, name, size, webp):
+        """The variant of `name` to serve at `size`, preferring WebP if `webp`; None until one exists."""
+        entry = self._best.get(name, {}).get((size, webp))
+        if entry is not None and (entry[1] is None or entry[1] == self.version()):
+            return entry[0]
+        preferred = [variant_name(name, size, True)] if webp else []
+        preferred.append(variant_name(name, size))
+        found = next((relative for relative in preferred if self.exists(relative)), None)
+        if found is None and os.path.isfile(os.path.join(self.folder, name)):
+            self.submit(name)  # older uploads get their variants on first view
+        self._best.setdefault(name, {})[(size, webp)] = (found, None if found == preferred[0] else self.version())
+        return found
+
+    def _run(self):
+        while True:
+            name = self._queue.get()
+            try:
+                self.generate(name)
+            except Exception as e:
+                print(f"Image variants for {name} failed:", e)
+            finally:
+                with self._lock:
+                    self._queued.discard(name)
+
+    def generate(self, name):
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            print("Pillow is not installed; serving original photos only.")
+            return
+
+        source = os.path.join(self.folder, name)
+        if not os.path.isfile(source):
+            return
+        os.makedirs(os.path.join(self.folder, "thumbs"), exist_ok=True)
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)  # phone photos are often stored sideways
+            image_format = IMAGE_EXTENSIONS.get(os.path.splitext(name)[1].lower(), "JPEG")
+            for size, max_side in self.sizes.items():
+                resized = image.copy()
+                resized.thumbnail((max_side, max_side))
+                for webp in (False, True):
+                    target = variant_name(name, size, webp)
+                    path = os.path.join(self.folder, target)
+                    if os.path.exists(path):
+                        continue
+                    out = resized
+                    if (webp or image_format == "JPEG") and out.mode not in ("RGB", "RGBA", "L"):
+                        out = out.convert("RGBA" if webp else "RGB")
+                    if image_format == "JPEG" and not webp and out.mode == "RGBA":
+                        out = out.convert("RGB")
+                    # Write beside the target and rename, so a request never sees half a file
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+                    with os.fdopen(fd, "wb") as f:
+                        out.save(f, "WEBP" if webp else image_format, quality=self.quality, optimize=True)
+                    os.chmod(tmp, 0o644)
+                    os.replace(tmp, path)
+                    self._ready.add(target)
+        self._best.pop(name, None)
+        self._version_at = 0.0  # look at the directory again on the next version()
+
+
+variants = ImageVariants(config.UPLOAD_FOLDER, config.IMAGE_SIZES, quality=config.IMAGE_QUALITY)
+
+
+def save_upload(file):
+    """Store an uploaded FileStorage by content hash; returns the stored file name."""
+    os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=config.UPLOAD_FOLDER, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        name = digest.hexdigest()[:32] + _extension(file.filename)
+        path = os.path.join(config.UPLOAD_FOLDER, name)
+        if os.path.exists(path):
+            os.remove(tmp)  # identical image already stored
+        else:
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    variants.submit(name)
+    return name
+
+
+def image_url(name, size=None):
+    """URL of photo `name` resized to `size` (a key of config.IMAGE_SIZES).
+
+    Prefers the WebP variant when config.IMAGE_WEBP is on, then the resized
+    original format, then the original itself until its variants exist.
+    """
+    name = str(name or "").strip()
+    if not name:
+        return url_for("static", filename="uploads/default.jpg")
+    if size and os.path.basename(name) == name:
+        relative = variants.best(name, size, config.IMAGE_WEBP)
+        if relative:
+            return url_for("static", filename="uploads/" + relative)
+    return url_for("static", filename="uploads/" + name)
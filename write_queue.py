@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+class WriteBehindQueue:
+    """Durable queue for append-only rows (leads, reviews) bound for Sheets.
+
+    `enqueue` commits the row to a local SQLite journal and returns at once; a
+    background flusher claims pending rows per tab and writes them with one
+    `writer(tab, rows)` call (append_rows), retrying with jittered exponential
+    backoff. Rows are deleted only after a successful write, so anything left
+    by a crash is replayed on the next start. Delivery is at-least-once: a
+    crash between the write and the delete can repeat a batch.
+
+    Claims carry a lease so several gunicorn workers can share one journal
+    without sending the same row twice.
+    """
+
+    def __init__(self, path, writer, batch_size=100, flush_interval=2.0,
+                 backoff_base=2.0, backoff_max=300.0, lease=120.0):
+        self.path = path
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher_pid = None
+        self._failures = {}
+        self._retry_at = {}
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " tab TEXT NOT NULL,"
+                " row TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " claimed_by TEXT,"
+                " claimed_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pending_tab ON pending (tab, id)")
+            self._ready = True
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def enqueue(self, tab, row):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO pending (tab, row, created_at) VALUES (?, ?, ?)",
+                         (tab, json.dumps(list(row)), time.time()))
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+
+    def pending(self, tab):
+        """Rows journaled for `tab` but not yet confirmed written, oldest first."""
+        self.start()
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT row FROM pending WHERE tab = ? ORDER BY id", (tab,)).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(row) for (row,) in rows]
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT tab, COUNT(*), MIN(created_at) FROM pending GROUP BY tab").fetchall()
+        finally:
+            conn.close()
+        now = time.time()
+        return {tab: {"pending": count, "oldest_age": round(now - oldest, 3), "failures": self._failures.get(tab, 0)}
+                for tab, count, oldest in rows}
+
+    def start(self):
+        # One flusher per process; forked workers start their own
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._run, name="write-behind-flusher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                while self.flush():
+                    pass
+            except Exception as e:
+                print("Write-behind flush error:", e)
+
+    def _claim(self, conn, owner):
+        """Claim the oldest batch of one tab that isn't backing off; returns (tab, [(id, row)])."""
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tabs = [tab for (tab,) in conn.execute(
+                "SELECT DISTINCT tab FROM pending WHERE claimed_until IS NULL OR claimed_until < ?", (now,))]
+            tabs = [tab for tab in tabs if self._retry_at.get(tab, 0) <= now]
+            if not tabs:
+                conn.execute("COMMIT")
+                return None, []
+            tab = tabs[0]
+            batch = conn.execute(
+                "SELECT id, row FROM pending WHERE tab = ? AND (claimed_until IS NULL OR claimed_until < ?)"
+                " ORDER BY id LIMIT ?", (tab, now, self.batch_size)).fetchall()
+            conn.executemany("UPDATE pending SET claimed_by = ?, claimed_until = ? WHERE id = ?",
+                             [(owner, now + self.lease, row_id) for row_id, _ in batch])
+            conn.execute("COMMIT")
+            return tab, batch
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def flush(self):
+        """Write one batch; returns True if there may be more to do right away."""
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        conn = self._connect()
+        try:
+            tab, batch = self._claim(conn, owner)
+            if not batch:
+                return False
+            ids = [(row_id,) for row_id, _ in batch]
+            try:
+                self.writer(tab, [json.loads(row) for _, row in batch])
+            except Exception as e:
+                failures = self._failures[tab] = self._failures.get(tab, 0) + 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+                self._retry_at[tab] = time.time() + delay * random.uniform(0.5, 1.0)
+                conn.executemany("UPDATE pending SET attempts = attempts + 1, claimed_by = NULL,"
+                                 " claimed_until = NULL WHERE id = ?", ids)
+                print(f"Write-behind flush to {tab} failed ({failures}x), retrying later:", e)
+                return True
+            self._failures.pop(tab, None)
+            self._retry_at.pop(tab, None)
+            conn.executemany("DELETE FROM pending WHERE id = ?", ids)
+            return True
+        finally:
+            conn.close()